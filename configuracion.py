@@ -0,0 +1,96 @@
+from functools import lru_cache
+
+# Tablas estáticas de la interfaz. Viven en un módulo aparte para que se construyan una sola vez por proceso
+# y no en cada rerun de Streamlit; este módulo no importa pandas.
+
+# Mapeo de columnas con inferencia automática
+# Estos son los nombres "ideales" o "esperados" de las columnas
+column_mappings_comp = {
+    'fecha_emision': ['Fecha de Emisión', 'Fecha Emision', 'Fecha', 'F. Emision'],
+    'tipo_comprobante': ['Tipo de Comprobante (AFIP - Mis Comprobantes)', 'Tipo Comprobante', 'Tipo', 'Tipo de Comprobante'],
+    'punto_venta': ['Punto de Venta', 'Pto Vta', 'PV'],
+    'numero_comprobante': ['Número', 'Numero Comprobante', 'Comprobante', 'Nro Comprobante', 'Nro. Comprobante'],
+    'cuit_proveedor': ['CUIT del Proveedor', 'CUIT Proveedor', 'CUIT', 'Cuit del Proveedor'],
+    'razon_social_proveedor': ['Razón social del Provedor', 'Razon Social Proveedor', 'Razon Social', 'Proveedor'],
+    'importe_neto': ['Importe Neto', 'Neto Gravado', 'Neto'],
+    'iva_inscripto': ['IVA Inscripto', 'IVA', 'IVA 21%', 'IVA 10.5%'],
+    'importe_exento': ['Importe Exento', 'Exento'],
+    'impuestos_internos_no_gravado': ['Impuestos Internos / No Gravado', 'Impuestos Internos', 'No Gravado'],
+    'importe_total_comprobante': ['Importe Total del Comprobante', 'Total Comprobante', 'Importe Total'],
+    'numero_cai': ['Número de CAI', 'CAI', 'Nro CAI'],
+    'cotizacion': ['Cotización', 'Cotizacion'],
+    'moneda': ['Moneda', 'Tipo Moneda'],
+    'codigo_concepto_articulo': ['Código de Concepto / Artículo', 'Cod Concepto', 'Concepto'],
+    'provincia_iibb': ['Provincia IIBB', 'Provincia'],
+}
+
+column_mappings_perc = {
+    'cuit_agente': ['CUIT Agente Ret./Perc.', 'CUIT Agente', 'CUIT'],
+    'numero_comprobante': ['Número Comprobante', 'Nro Comprobante', 'Comprobante'],
+    'impuesto': ['Impuesto', 'Tipo Impuesto'],
+    'descripcion_impuesto': ['Descripción Impuesto', 'Descripcion Impuesto', 'Impuesto Descripcion'],
+    'regimen': ['Régimen', 'Regimen', 'Codigo Regimen'],
+    'descripcion_regimen': ['Descripción Régimen', 'Descripcion Regimen', 'Regimen Descripcion'],
+    'importe_percepcion': ['Importe Ret./Perc.', 'Importe Percepcion', 'Percepcion', 'Importe'],
+}
+
+# Columnas internas estandarizadas que el script genera (para mapear a la plantilla ONVIO)
+internal_standard_cols_map_for_template = {
+    'Fecha de Emisión': 'Fecha de Emisión',
+    'Tipo de Comprobante': 'TIPO_COMPROBANTE_ESTANDAR',
+    'Letra': 'LETRA_COMPROBANTE_ESTANDAR',
+    'Punto de Venta': 'Punto de Venta',
+    'Número': 'Número',
+    'Número de CAI': 'Número de CAI',
+    'Razón social del Provedor': 'Razón social del Provedor',
+    'CUIT': 'CUIT del Proveedor', 
+    'Número de Documento del Cliente': 'CUIT del Proveedor', # ONVIO a veces usa esta para CUIT
+    'Situación de IVA del Proveedor': 'SITUACION_IVA_ESTANDAR',
+    'Cotización': 'Cotización',
+    'Moneda': 'Moneda',
+    'Importe Neto': 'Importe Neto',
+    'IVA Inscripto': 'IVA Inscripto',
+    'Importe Exento': 'Importe Exento',
+    'Impuestos Internos / No Gravado': 'Impuestos Internos / No Gravado',
+    'Importe Percepción': 'PERCEPCION_FINAL',
+    'Importe Total del Comprobante': 'Importe Total del Comprobante',
+    'Código de Concepto / Artículo': 'Código de Concepto / Artículo',
+    'Provincia IIBB': 'Provincia IIBB',
+    'Cód. Regimen Especial': 'COD_REGIMEN_ONVIO',
+    'Art. Regimen Especial': 'ART_REGIMEN_ONVIO',
+    'Desc. Regimen Especial': 'DESC_REGIMEN_ONVIO',
+    'Alerta / Observación': 'ALERTA_DIFERENCIA_FINAL',
+    'Método de Cruce': 'METODO_CRUCE',
+    'Confianza de Cruce': 'CONFIANZA_CRUCE'
+}
+
+
+@lru_cache(maxsize=None)
+def inferir_columna_plantilla(template_col_name):
+    """
+    Intenta inferir a qué columna interna estandarizada corresponde una columna de la plantilla.
+    Busca coincidencias con las claves del diccionario (ej. 'CUIT') y con los valores (ej. 'CUIT del Proveedor').
+    Retorna la clave interna o None. Se calcula una vez por nombre de columna.
+    """
+    # Preferencia por la clave interna (ej. 'CUIT')
+    for internal_key in internal_standard_cols_map_for_template.keys():
+        if template_col_name.lower() == internal_key.lower():
+            return internal_key
+
+    # Si no se encontró por clave, intentar por el nombre estandarizado (ej. 'CUIT del Proveedor')
+    for internal_key, internal_col_name in internal_standard_cols_map_for_template.items():
+        if internal_col_name and template_col_name.lower() == internal_col_name.lower():
+            return internal_key
+    return None
+
+
+def columnas_compartidas(mapa):
+    """
+    Retorna {columna: [campos]} con las columnas de origen asignadas a más de un campo del mapeo.
+    El procesamiento renombra cada columna a un solo nombre estándar, así que los demás campos quedarían sin datos.
+    """
+    campos_por_columna = {}
+    for campo, columna in mapa.items():
+        if columna is not None:
+            campos_por_columna.setdefault(columna, []).append(campo)
+    return {columna: campos for columna, campos in campos_por_columna.items() if len(campos) > 1}
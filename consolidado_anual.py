@@ -0,0 +1,265 @@
+import re
+import logging
+import traceback
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from procesador_vectorizado import process_and_fill_template_vectorizado, nuevas_caches
+from explorador import preparar_explorador
+from cruce_alternativo import COLUMNAS_REPORTE, HOJA_REPORTE, reporte_cruce
+from duplicados import (
+    detectar_duplicados, detectar_repetidos_previos, eliminar_duplicados, nuevos_hashes_previos, resumen_duplicados,
+    CLAVE_COMPROBANTES, EXTRAS_CLAVE_COMPROBANTES, CLAVE_PERCEPCIONES, EXTRAS_CLAVE_PERCEPCIONES,
+)
+
+# Procesamiento consolidado de varios períodos (p. ej. las doce exportaciones mensuales de un año).
+# Cada período se lee, se procesa y se escribe en el Excel de salida antes de pasar al siguiente, así que
+# en memoria solo hay un período a la vez. El Excel se arma con openpyxl en modo write_only, que vuelca las
+# filas a disco a medida que se agregan. Las caches de tipos de comprobante y regímenes se comparten entre
+# períodos (ver `nuevas_caches`). Los duplicados se detectan dentro de cada período y, con los hashes de filas y
+# claves ya vistos, también entre períodos (las descargas de períodos consecutivos suelen superponerse).
+
+# Nombres y abreviaturas de meses que se reconocen como palabra dentro del nombre del archivo
+MESES = {
+    'enero': 1, 'ene': 1, 'febrero': 2, 'feb': 2, 'marzo': 3, 'mar': 3, 'abril': 4, 'abr': 4, 'mayo': 5, 'may': 5,
+    'junio': 6, 'jun': 6, 'julio': 7, 'jul': 7, 'agosto': 8, 'ago': 8, 'septiembre': 9, 'setiembre': 9, 'sept': 9,
+    'sep': 9, 'set': 9, 'octubre': 10, 'oct': 10, 'noviembre': 11, 'nov': 11, 'diciembre': 12, 'dic': 12,
+}
+
+TIPOS_ARCHIVO = ['comprobantes', 'percepciones']
+SIN_PERIODO = "Sin período"
+
+HOJA_PLANTILLA = "Plantilla"
+HOJA_SUBTOTALES = "Subtotales por período"
+
+# Columnas de la hoja de subtotales además de los importes de `explorador.COLUMNAS_IMPORTE` que la plantilla tenga mapeados
+COLUMNAS_SUBTOTALES = [
+    'Período', 'Archivos', 'Comprobantes', 'Percepciones', 'Duplicados en el período', 'Repetidos de períodos anteriores',
+    'Filas eliminadas por duplicados', 'Registros generados', 'Registros con alerta',
+]
+
+
+def detectar_periodo(nombre_archivo):
+    """
+    Retorna el período indicado en el nombre del archivo: 'AAAA-MM' (2024-01, 202401, 01-2024, enero 2024,
+    feb_2024...), 'MM' si solo se reconoce el mes (enero.xlsx, percepciones feb.xlsx) o None si no se reconoce.
+    """
+    nombre = nombre_archivo.lower().rsplit('.', 1)[0]
+    for patron, orden in [
+        (r'(?<!\d)(20\d{2})[-_. ]?(0[1-9]|1[0-2])(?!\d)', 'anio_mes'),
+        (r'(?<!\d)(0?[1-9]|1[0-2])[-_. ](20\d{2})(?!\d)', 'mes_anio'),
+    ]:
+        encontrado = re.search(patron, nombre)
+        if encontrado:
+            anio, mes = encontrado.groups() if orden == 'anio_mes' else encontrado.groups()[::-1]
+            return f"{anio}-{int(mes):02d}"
+    meses = [MESES[palabra] for palabra in re.findall(r'[a-z]+', nombre) if palabra in MESES]
+    if len(set(meses)) != 1:
+        return None  # Ningún mes, o más de uno (ambiguo)
+    anio = re.search(r'(?<!\d)(20\d{2})(?!\d)', nombre)
+    return f"{anio.group(1)}-{meses[0]:02d}" if anio else f"{meses[0]:02d}"
+
+
+def detectar_periodos(archivos_comp, archivos_perc):
+    """
+    Período de cada archivo subido (con atributo `name`), para mostrar y corregir antes de procesar.
+    Los archivos con mes pero sin año toman el año de los demás archivos si todos los que lo indican coinciden.
+    Retorna una lista de dicts {'Tipo', 'Archivo', 'Período'}; 'Período' queda vacío si no se reconoce.
+    """
+    filas = [
+        {'Tipo': tipo, 'Archivo': archivo.name, 'Período': detectar_periodo(archivo.name) or ""}
+        for tipo, archivos in zip(TIPOS_ARCHIVO, [archivos_comp, archivos_perc])
+        for archivo in archivos
+    ]
+    anios = {fila['Período'][:4] for fila in filas if len(fila['Período']) == 7}
+    if len(anios) == 1:
+        anio = anios.pop()
+        for fila in filas:
+            if len(fila['Período']) == 2:
+                fila['Período'] = f"{anio}-{fila['Período']}"
+    return filas
+
+
+def agrupar_por_periodo(archivos_comp, archivos_perc, periodos_asignados=None):
+    """
+    Agrupa los archivos subidos por período. `periodos_asignados` ({(tipo, nombre de archivo): período}) indica el
+    período de cada archivo, p. ej. corregido por el usuario; los archivos que no figuran usan `detectar_periodos`.
+    Los archivos sin período quedan en SIN_PERIODO, que `validar_periodos` rechaza.
+    Retorna un dict {periodo: {'comprobantes': [...], 'percepciones': [...]}} ordenado por período.
+    """
+    detectados = {(fila['Tipo'], fila['Archivo']): fila['Período'] for fila in detectar_periodos(archivos_comp, archivos_perc)}
+    periodos_asignados = periodos_asignados or {}
+    periodos = {}
+    for tipo, archivos in zip(TIPOS_ARCHIVO, [archivos_comp, archivos_perc]):
+        for archivo in archivos:
+            clave = (tipo, archivo.name)
+            periodo = periodos_asignados.get(clave, detectados[clave])
+            # Una celda vaciada en la tabla editable puede volver como NaN en lugar de None
+            periodo = (periodo.strip() if isinstance(periodo, str) else "") or SIN_PERIODO
+            periodos.setdefault(periodo, {tipo: [] for tipo in TIPOS_ARCHIVO})[tipo].append(archivo)
+    return dict(sorted(periodos.items()))
+
+
+def validar_periodos(periodos):
+    """
+    Retorna (errores, advertencias). Errores, que impiden procesar: archivos sin período y períodos con percepciones
+    pero sin comprobantes (las percepciones se perderían sin aviso). Advertencias: períodos con comprobantes pero
+    sin percepciones, que se procesan igual (un mes puede no tener percepciones) con un archivo de percepciones vacío.
+    """
+    errores, advertencias = [], []
+    for periodo, archivos in periodos.items():
+        nombres = {tipo: ", ".join(archivo.name for archivo in archivos[tipo]) for tipo in TIPOS_ARCHIVO}
+        if periodo == SIN_PERIODO:
+            errores.append(f"No se reconoció el período de: {', '.join(n for n in nombres.values() if n)}.")
+        elif not archivos['comprobantes']:
+            errores.append(f"Período {periodo}: hay percepciones ({nombres['percepciones']}) pero ningún archivo de comprobantes.")
+        elif not archivos['percepciones']:
+            advertencias.append(f"Período {periodo}: hay comprobantes ({nombres['comprobantes']}) pero ningún archivo de percepciones; se procesa sin percepciones.")
+    return errores, advertencias
+
+
+def _leer_periodo(archivos, leer_archivo, columnas_vacio):
+    """Lee y concatena los archivos de un tipo para un período. Sin archivos, retorna un DataFrame vacío con `columnas_vacio`."""
+    if not archivos:
+        return pd.DataFrame(columns=columnas_vacio)
+    return pd.concat([leer_archivo(archivo) for archivo in archivos], ignore_index=True)
+
+
+def _duplicados_periodo(df, columnas_clave, columnas_extra, hashes_previos, nivel):
+    """
+    Detecta duplicados dentro del período y repetidos de períodos anteriores (actualizando `hashes_previos`).
+    Retorna (df sin los duplicados que indica `nivel`, resumen de `resumen_duplicados`).
+    """
+    deteccion = detectar_repetidos_previos(detectar_duplicados(df, columnas_clave, columnas_extra), hashes_previos)
+    return eliminar_duplicados(df, deteccion, nivel), resumen_duplicados(deteccion)
+
+
+def _subtotales(periodo, archivos, df_comp, df_perc, resumenes, eliminadas, resultado_df, column_map_template):
+    """Fila de subtotales de un período: cantidades (incluidos duplicados) y suma de cada importe mapeado en la plantilla."""
+    explorador = preparar_explorador(resultado_df, column_map_template)
+    fila = {
+        'Período': periodo,
+        'Archivos': ", ".join(archivo.name for archivo in archivos['comprobantes'] + archivos['percepciones']),
+        'Comprobantes': len(df_comp),
+        'Percepciones': len(df_perc),
+        'Duplicados en el período': sum(resumen['exactos'] + resumen['clave'] for resumen in resumenes),
+        'Repetidos de períodos anteriores': sum(resumen['previos_exactos'] + resumen['previos_clave'] for resumen in resumenes),
+        'Filas eliminadas por duplicados': eliminadas,
+        'Registros generados': len(resultado_df),
+        'Registros con alerta': int(explorador['tiene_alerta'].sum()),
+    }
+    for etiqueta, importes in explorador['importes'].items():
+        fila[etiqueta] = round(float(np.nansum(importes)), 2)
+    return fila
+
+
+def _valor_celda(valor):
+    """Convierte un valor del resultado a uno que openpyxl pueda escribir (los NaN quedan como celda vacía, igual que en `to_excel`)."""
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)) or valor is pd.NaT:
+        return None
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+def procesar_periodos(periodos, leer_archivo, template_df, column_map_comp, column_map_perc, column_map_template, cruce_alternativo=False, nivel_duplicados='ninguno', cruce_por_importe=False):
+    """
+    Procesa los períodos de `agrupar_por_periodo` de a uno con el motor vectorizado y escribe un único Excel con la
+    plantilla consolidada (hoja "Plantilla", en orden de período) y una hoja de subtotales por período.
+    `leer_archivo(archivo)` retorna el DataFrame de un archivo. Antes de procesar cada período se eliminan los
+    duplicados según `nivel_duplicados` (ver `duplicados.NIVELES_ELIMINACION`), incluidos los repetidos de
+    períodos anteriores; con 'ninguno' solo se informan en los subtotales. Con `cruce_alternativo` se agrega la hoja
+    "Cruce alternativo" con los comprobantes asociados sin coincidencia exacta, su período, método y confianza.
+
+    Retorna (resultado, mensaje): `resultado` es un dict con el Excel en bytes ('excel') y los subtotales
+    ('subtotales', DataFrame con una fila por período y una de total), o None si hubo un error.
+    """
+    errores, advertencias = validar_periodos(periodos)
+    for advertencia in advertencias:
+        logging.warning(advertencia)
+    if errores:
+        error_msg = "No se puede procesar: " + " ".join(errores)
+        logging.error(error_msg)
+        return None, error_msg
+
+    periodo = None
+    try:
+        caches = nuevas_caches()
+        libro = Workbook(write_only=True)
+        hoja_plantilla = libro.create_sheet(HOJA_PLANTILLA)
+        columnas_plantilla = list(template_df.columns) + [c for c in column_map_template if c not in template_df.columns]
+        hoja_plantilla.append(columnas_plantilla)
+        hoja_cruce = libro.create_sheet(HOJA_REPORTE) if cruce_alternativo else None
+        if hoja_cruce is not None:
+            hoja_cruce.append(['Período'] + COLUMNAS_REPORTE)
+        filas_escritas = 0
+
+        claves_comp = ([column_map_comp[k] for k in CLAVE_COMPROBANTES if k in column_map_comp], [column_map_comp[k] for k in EXTRAS_CLAVE_COMPROBANTES if k in column_map_comp])
+        claves_perc = ([column_map_perc[k] for k in CLAVE_PERCEPCIONES if k in column_map_perc], [column_map_perc[k] for k in EXTRAS_CLAVE_PERCEPCIONES if k in column_map_perc])
+        hashes_previos_comp, hashes_previos_perc = nuevos_hashes_previos(), nuevos_hashes_previos()
+
+        filas_subtotales = []
+        for periodo, archivos in periodos.items():
+            df_comp = _leer_periodo(archivos['comprobantes'], leer_archivo, list(column_map_comp.values()))
+            df_perc = _leer_periodo(archivos['percepciones'], leer_archivo, list(column_map_perc.values()))
+            filas_leidas = len(df_comp) + len(df_perc)
+            df_comp, resumen_comp = _duplicados_periodo(df_comp, *claves_comp, hashes_previos_comp, nivel_duplicados)
+            df_perc, resumen_perc = _duplicados_periodo(df_perc, *claves_perc, hashes_previos_perc, nivel_duplicados)
+            eliminadas = filas_leidas - len(df_comp) - len(df_perc)
+
+            detalle_cruce = {}
+            resultado_df, mensaje = process_and_fill_template_vectorizado(
+                df_comp, df_perc, template_df, column_map_comp, column_map_perc, column_map_template,
+                cruce_alternativo=cruce_alternativo, caches=caches, cruce_por_importe=cruce_por_importe, detalle_cruce=detalle_cruce
+            )
+            if resultado_df is None:
+                return None, f"Período {periodo}: {mensaje}"
+            logging.info(f"Período {periodo}: {len(resultado_df)} registros. {mensaje}")
+
+            for fila in resultado_df.itertuples(index=False, name=None):
+                hoja_plantilla.append([_valor_celda(valor) for valor in fila])
+            if hoja_cruce is not None and 'cruce' in detalle_cruce:
+                reporte = reporte_cruce(detalle_cruce['cruce'], primera_fila=filas_escritas + 2)
+                reporte.insert(0, 'Período', periodo)
+                for fila in reporte.itertuples(index=False, name=None):
+                    hoja_cruce.append([_valor_celda(valor) for valor in fila])
+            filas_escritas += len(resultado_df)
+            filas_subtotales.append(_subtotales(
+                periodo, archivos, df_comp, df_perc, [resumen_comp, resumen_perc], eliminadas, resultado_df, column_map_template
+            ))
+            # Liberar el período antes de leer el siguiente
+            del df_comp, df_perc, resultado_df
+
+        subtotales = pd.DataFrame(filas_subtotales)
+        if len(subtotales):
+            total = {col: subtotales[col].sum() for col in subtotales.columns if col not in ('Período', 'Archivos')}
+            total = {col: round(valor, 2) if isinstance(valor, float) else int(valor) for col, valor in total.items()}
+            subtotales = pd.concat([subtotales, pd.DataFrame([{'Período': "Total", 'Archivos': "", **total}])], ignore_index=True)
+
+        hoja_subtotales = libro.create_sheet(HOJA_SUBTOTALES)
+        hoja_subtotales.append(list(subtotales.columns))
+        for fila in subtotales.itertuples(index=False, name=None):
+            hoja_subtotales.append([_valor_celda(valor) for valor in fila])
+
+        salida = BytesIO()
+        libro.save(salida)
+        registros = int(subtotales['Registros generados'].iloc[-1]) if len(subtotales) else 0
+        mensaje = f"Procesamiento consolidado completado: {len(periodos)} períodos, {registros} registros generados"
+        if len(subtotales) and (subtotales['Duplicados en el período'].iloc[-1] or subtotales['Repetidos de períodos anteriores'].iloc[-1]):
+            mensaje += (
+                f". Duplicados: {subtotales['Duplicados en el período'].iloc[-1]} dentro de un mismo período y "
+                f"{subtotales['Repetidos de períodos anteriores'].iloc[-1]} repetidos de períodos anteriores "
+                f"({subtotales['Filas eliminadas por duplicados'].iloc[-1]} filas eliminadas)"
+            )
+        if advertencias:
+            mensaje += ". " + " ".join(advertencias)
+        return {'excel': salida.getvalue(), 'subtotales': subtotales}, mensaje
+
+    except Exception as e:
+        error_msg = f"Error inesperado durante el procesamiento del período {periodo}: {e}. Por favor, revisa los archivos de ese período."
+        logging.error(error_msg)
+        logging.error(traceback.format_exc())
+        return None, error_msg
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+
+from procesador_vectorizado import digitos_serie, numeros_serie, sin_ceros_izquierda
+
+# Segundo cruce para comprobantes que no encontraron percepciones por la clave exacta CUIT + número.
+# AFIP a veces exporta el número distinto en cada archivo (con o sin punto de venta, con o sin ceros a la
+# izquierda). En lugar de comparar cada par de filas, se arman índices por CUIT y se resuelven con merges
+# (tablas hash) y un merge_asof por importe (búsqueda en listas ordenadas), en tiempo casi lineal.
+#
+# Solo participan las filas sin coincidencia exacta de ambos lados, y cada comprobante se asocia a lo sumo
+# con una clave de percepciones (y viceversa). Las pasadas van de mayor a menor confianza; un candidato
+# ambiguo (más de una opción en la misma pasada, de cualquiera de los dos lados) no se asocia.
+
+DIGITOS_NUMERO = 8  # Los números de comprobante de AFIP tienen 8 dígitos; lo anterior es el punto de venta
+TOLERANCIA_IMPORTE = 0.1  # Misma tolerancia de redondeo que la alerta de diferencia final
+
+# Hoja del Excel descargado con los comprobantes asociados sin coincidencia exacta (ver `reporte_cruce`)
+HOJA_REPORTE = "Cruce alternativo"
+COLUMNAS_REPORTE = ['Fila', 'CUIT del Proveedor', 'Número', 'Método de Cruce', 'Confianza de Cruce']
+
+# (método, confianza) de cada pasada, en el orden en que se aplican
+PASADAS = [
+    ('NUMERO_SIN_CEROS', 0.95),  # Mismo número ignorando ceros a la izquierda
+    ('PUNTO_VENTA_NUMERO', 0.90),  # Un archivo incluye el punto de venta en el número y el otro no
+    ('NUMERO_SIN_PUNTO_VENTA', 0.75),  # Coinciden los últimos 8 dígitos (puntos de venta distintos o mal cargados)
+    ('IMPORTE', 0.50),  # Mismo CUIT y la percepción explica la diferencia del comprobante
+]
+
+
+def _variantes(cuit, numero, punto_venta=None):
+    """
+    Variantes de número para los índices por CUIT: sin ceros a la izquierda, con el punto de venta antepuesto
+    (solo si se conoce) y sin punto de venta (últimos 8 dígitos).
+    """
+    numero = digitos_serie(numero)
+    variantes = pd.DataFrame({
+        'CUIT': numeros_serie(cuit).to_numpy(),
+        'NUMERO_SIN_CEROS': sin_ceros_izquierda(numero).to_numpy(),
+        'NUMERO_SIN_PUNTO_VENTA': sin_ceros_izquierda(numero.str[-DIGITOS_NUMERO:]).to_numpy(),
+    })
+    if punto_venta is None:
+        # AFIP no informa el punto de venta por separado en percepciones: si lo trae, viene dentro del número
+        variantes['PUNTO_VENTA_NUMERO'] = variantes['NUMERO_SIN_CEROS']
+    else:
+        punto_venta = numeros_serie(punto_venta)
+        con_punto_venta = sin_ceros_izquierda(punto_venta + numero.str[-DIGITOS_NUMERO:].str.zfill(DIGITOS_NUMERO))
+        variantes['PUNTO_VENTA_NUMERO'] = con_punto_venta.where(punto_venta != "", "").to_numpy()
+    return variantes
+
+
+def _uno_a_uno(candidatos):
+    """Descarta los candidatos ambiguos: cada comprobante y cada clave de percepciones deben aparecer una sola vez."""
+    candidatos = candidatos.drop_duplicates(['POSICION', 'KEY_PERC'])
+    unico_comp = ~candidatos['POSICION'].duplicated(keep=False)
+    unico_perc = ~candidatos['KEY_PERC'].duplicated(keep=False)
+    return candidatos[unico_comp & unico_perc]
+
+
+def _en_tolerancia(izquierda, columna_izquierda, derecha, columna_derecha):
+    """
+    Para cada fila de `izquierda`, cuántas filas de `derecha` del mismo CUIT tienen un importe a no más de
+    TOLERANCIA_IMPORTE, y la posición (en `derecha`) de la de mayor importe entre ellas. Se resuelve con dos
+    merge_asof por CUIT sobre los importes ordenados: filas con importe hasta el importe + tolerancia menos filas
+    con importe por debajo del importe - tolerancia.
+    Retorna (cantidades, posiciones) como arrays alineados con `izquierda` (posición -1 si no hay ninguna).
+    """
+    ordenada = pd.DataFrame({
+        'CUIT': derecha['CUIT'].to_numpy(),
+        'IMPORTE': derecha[columna_derecha].to_numpy(dtype=float),
+        'POSICION_DERECHA': np.arange(len(derecha)),
+    }).sort_values('IMPORTE', kind='stable')
+    ordenada['ORDEN'] = ordenada.groupby('CUIT').cumcount()
+
+    importes = izquierda[columna_izquierda].to_numpy(dtype=float)
+    ordenes = []
+    for limite, incluido in [(importes + TOLERANCIA_IMPORTE, True), (importes - TOLERANCIA_IMPORTE, False)]:
+        limites = pd.DataFrame({'CUIT': izquierda['CUIT'].to_numpy(), 'LIMITE': limite, 'FILA': np.arange(len(izquierda))})
+        cruce = pd.merge_asof(
+            limites.sort_values('LIMITE', kind='stable'), ordenada,
+            left_on='LIMITE', right_on='IMPORTE', by='CUIT', allow_exact_matches=incluido,
+        ).sort_values('FILA')
+        ordenes.append(cruce)
+    hasta, debajo = ordenes
+    cantidades = hasta['ORDEN'].fillna(-1).to_numpy(dtype=int) - debajo['ORDEN'].fillna(-1).to_numpy(dtype=int)
+    return cantidades, hasta['POSICION_DERECHA'].fillna(-1).to_numpy(dtype=int)
+
+
+def _candidatos_por_importe(comp, perc):
+    """
+    Pasada por importe: un comprobante se asocia con una clave de percepciones del mismo CUIT cuya suma explica su
+    diferencia, solo si es la única clave dentro de la tolerancia y el comprobante es el único que esa clave explica
+    (p. ej. dos percepciones de 10.00 de IVA e IIBB para una diferencia de 10.00 no se asocian).
+    """
+    izquierda = comp[comp['DIFERENCIA'] > 0.05]
+    derecha = perc[perc['SUMA'] > 0]
+    if izquierda.empty or derecha.empty:
+        return pd.DataFrame(columns=['POSICION', 'KEY_PERC'])
+    cantidades_comp, posiciones = _en_tolerancia(izquierda, 'DIFERENCIA', derecha, 'SUMA')
+    cantidades_perc, _ = _en_tolerancia(derecha, 'SUMA', izquierda, 'DIFERENCIA')
+    unico = cantidades_comp == 1
+    aceptado = cantidades_perc[posiciones[unico]] == 1
+    return pd.DataFrame({
+        'POSICION': izquierda['POSICION'].to_numpy()[unico][aceptado],
+        'KEY_PERC': derecha['KEY_PERC'].to_numpy()[posiciones[unico][aceptado]],
+    })
+
+
+def cruzar_sin_coincidencia(df_comp, df_perc, por_importe=False):
+    """
+    Busca percepciones para los comprobantes cuya KEY no aparece en `df_perc`.
+    Espera las columnas con los nombres estándar del motor (KEY, CUIT, número, importes ya numéricos y, si
+    existe, Punto de Venta). La pasada por importe (confianza 0.50) solo se aplica con `por_importe=True`.
+
+    Retorna un DataFrame con una fila por comprobante asociado: POSICION (posición de la fila en `df_comp`),
+    KEY_ALTERNATIVA (la KEY de percepciones a usar en el cruce), METODO_CRUCE y CONFIANZA_CRUCE.
+    """
+    columnas_resultado = ['POSICION', 'KEY_ALTERNATIVA', 'METODO_CRUCE', 'CONFIANZA_CRUCE']
+    requeridas_comp = ['CUIT del Proveedor', 'Número', 'Importe Total del Comprobante']
+    requeridas_perc = ['CUIT Agente Ret./Perc.', 'Número Comprobante', 'Importe Ret./Perc.']
+    if any(col not in df_comp.columns for col in requeridas_comp) or any(col not in df_perc.columns for col in requeridas_perc):
+        return pd.DataFrame(columns=columnas_resultado)
+
+    claves_perc = set(df_perc['KEY'])
+    claves_comp = set(df_comp['KEY'])
+
+    sin_cruce_comp = ~df_comp['KEY'].isin(claves_perc).to_numpy()
+    perc_libres = df_perc[~df_perc['KEY'].isin(claves_comp).to_numpy()]
+    if not sin_cruce_comp.any() or perc_libres.empty:
+        return pd.DataFrame(columns=columnas_resultado)
+
+    # Solo se normalizan las filas sin coincidencia: en un período típico son una fracción del total
+    comp_libres = df_comp[sin_cruce_comp]
+    punto_venta = comp_libres['Punto de Venta'] if 'Punto de Venta' in comp_libres.columns else pd.Series("", index=comp_libres.index)
+    comp = _variantes(comp_libres['CUIT del Proveedor'], comp_libres['Número'], punto_venta)
+    comp['POSICION'] = np.flatnonzero(sin_cruce_comp)
+    base = sum(
+        comp_libres[col].to_numpy(dtype=float) for col in ['Importe Neto', 'IVA Inscripto', 'Importe Exento', 'Impuestos Internos / No Gravado']
+        if col in comp_libres.columns
+    )
+    comp['DIFERENCIA'] = comp_libres['Importe Total del Comprobante'].to_numpy(dtype=float) - base
+    comp = comp[comp['CUIT'] != ""]
+
+    # Una fila por KEY de percepciones libre, con la suma de sus importes
+    perc = _variantes(perc_libres['CUIT Agente Ret./Perc.'], perc_libres['Número Comprobante'])
+    perc['KEY_PERC'] = perc_libres['KEY'].to_numpy()
+    perc['SUMA'] = perc_libres.groupby('KEY')['Importe Ret./Perc.'].transform('sum').to_numpy()
+    perc = perc[perc['CUIT'] != ""].drop_duplicates('KEY_PERC')
+
+    asociados = []
+    for metodo, confianza in PASADAS:
+        if comp.empty or perc.empty:
+            break
+        if metodo == 'IMPORTE' and not por_importe:
+            continue
+        if metodo == 'IMPORTE':
+            candidatos = _candidatos_por_importe(comp, perc)
+        else:
+            izquierda = comp[comp[metodo] != ""]
+            candidatos = izquierda[['POSICION', 'CUIT', metodo]].merge(perc[['KEY_PERC', 'CUIT', metodo]], on=['CUIT', metodo])
+        candidatos = _uno_a_uno(candidatos[['POSICION', 'KEY_PERC']])
+        if candidatos.empty:
+            continue
+        asociados.append(pd.DataFrame({
+            'POSICION': candidatos['POSICION'].to_numpy(),
+            'KEY_ALTERNATIVA': candidatos['KEY_PERC'].to_numpy(),
+            'METODO_CRUCE': metodo,
+            'CONFIANZA_CRUCE': confianza,
+        }))
+        # Lo asociado en esta pasada ya no participa de las siguientes
+        comp = comp[~comp['POSICION'].isin(candidatos['POSICION'])]
+        perc = perc[~perc['KEY_PERC'].isin(candidatos['KEY_PERC'])]
+
+    if not asociados:
+        return pd.DataFrame(columns=columnas_resultado)
+    return pd.concat(asociados, ignore_index=True)
+
+
+def reporte_cruce(cruce_df, primera_fila=2):
+    """
+    Filas del detalle de cruce (ver `detalle_cruce` del motor vectorizado) asociadas por el cruce alternativo, para
+    revisarlas en una hoja aparte. 'Fila' es la fila de cada comprobante en la hoja de la plantilla (la primera fila
+    de datos es `primera_fila`, debajo de los encabezados).
+    """
+    alternativos = ~cruce_df['Método de Cruce'].isin(['', 'EXACTO']).to_numpy()
+    reporte = cruce_df[alternativos].copy()
+    reporte.insert(0, 'Fila', np.flatnonzero(alternativos) + primera_fila)
+    return reporte.reset_index(drop=True)[COLUMNAS_REPORTE]
@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+
+from procesador_vectorizado import numeros_serie
+
+# Detección de duplicados en comprobantes y percepciones antes del cruce (paso 3 del procesamiento).
+# Las exportaciones de AFIP de rangos de fechas que se superponen repiten filas: una percepción repetida
+# se suma dos veces en SUMA_PERCEPCIONES y un comprobante repetido multiplica filas en el merge.
+# Todo se resuelve con hashes de 64 bits por fila (pd.util.hash_pandas_object), en tiempo lineal.
+
+# Columnas (claves del mapeo de columnas) que forman la clave de cada archivo. En comprobantes la clave
+# incluye punto de venta y tipo: "Mis Comprobantes" informa el número sin el punto de venta, así que un mismo
+# proveedor repite números entre puntos de venta (y entre facturas y notas de crédito) sin que sean duplicados.
+# En percepciones un comprobante puede tener varias líneas legítimas, así que la clave incluye además
+# impuesto y régimen.
+CLAVE_COMPROBANTES = ['cuit_proveedor', 'punto_venta', 'numero_comprobante']
+EXTRAS_CLAVE_COMPROBANTES = ['tipo_comprobante']
+CLAVE_PERCEPCIONES = ['cuit_agente', 'numero_comprobante']
+EXTRAS_CLAVE_PERCEPCIONES = ['impuesto', 'regimen']
+
+NIVELES_ELIMINACION = {
+    'ninguno': "No eliminar (solo informar)",
+    'exactos': "Eliminar duplicados exactos",
+    'clave': "Eliminar exactos y repetidos por clave (se conserva la primera fila de cada clave)",
+}
+
+
+def _normalizar_texto(serie):
+    """
+    Texto en mayúsculas, sin espacios al principio/fin ni espacios repetidos; los nulos quedan como cadena vacía.
+    Se normaliza una vez por valor distinto. Retorna un array de objetos alineado con la serie.
+    """
+    codigos, unicos = pd.factorize(serie.astype(object))
+    normalizados = pd.Series(unicos, dtype=object).astype(str).str.strip().str.upper().str.replace(r'\s+', ' ', regex=True)
+    return np.append(normalizados.to_numpy(dtype=object), "")[codigos]
+
+
+def _hash_filas(df):
+    """
+    Hash de 64 bits por fila sobre valores normalizados: los números (aunque vengan como texto) se comparan
+    por valor redondeado a centavos y el resto como texto normalizado.
+    """
+    partes = {}
+    for i, col in enumerate(df.columns):
+        serie = df[col]
+        try:
+            numeros = pd.to_numeric(serie, errors='coerce')
+        except TypeError:
+            numeros = pd.Series(np.nan, index=serie.index)
+        # Sumar 0.0 convierte -0.0 en 0.0 para que ambos tengan el mismo hash
+        partes[f'n{i}'] = numeros.astype(float).round(2) + 0.0
+        partes[f't{i}'] = _normalizar_texto(serie.where(numeros.isna()))
+    if not partes:
+        return np.zeros(len(df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(pd.DataFrame(partes, index=df.index), index=False).to_numpy()
+
+
+def detectar_duplicados(df, columnas_clave, columnas_extra=()):
+    """
+    Detecta filas duplicadas en `df`.
+
+    - DUPLICADO_EXACTO: la fila (normalizada) repite una fila anterior idéntica.
+    - DUPLICADO_CLAVE: la clave (números de `columnas_clave` con `numeros_serie`, el mismo criterio del cruce
+      alternativo, + texto de `columnas_extra`) la comparten dos o más filas distintas. Las filas con alguna parte
+      de `columnas_clave` vacía no se agrupan por clave y se marcan en CLAVE_INCOMPLETA.
+
+    Retorna un DataFrame alineado con `df` con esas columnas más HASH_FILA y HASH_CLAVE.
+    """
+    hash_fila = _hash_filas(df)
+    exacto = pd.Series(hash_fila).duplicated(keep='first').to_numpy()
+
+    partes_clave = {f'k{i}': numeros_serie(df[col]).to_numpy() for i, col in enumerate(columnas_clave)}
+    partes_clave.update({f'e{i}': _normalizar_texto(df[col]) for i, col in enumerate(columnas_extra)})
+    clave_completa = np.ones(len(df), dtype=bool)
+    for i in range(len(columnas_clave)):
+        clave_completa &= partes_clave[f'k{i}'] != ""
+    if partes_clave:
+        hash_clave = pd.util.hash_pandas_object(pd.DataFrame(partes_clave), index=False).to_numpy()
+    else:
+        hash_clave = np.zeros(len(df), dtype=np.uint64)
+
+    # Una clave está repetida si la comparten al menos dos filas que no son copias exactas entre sí
+    distintas = ~exacto & clave_completa
+    conteo = pd.Series(hash_clave[distintas]).value_counts()
+    repetida = pd.Series(hash_clave).map(conteo).fillna(0).to_numpy() > 1
+
+    return pd.DataFrame({
+        'HASH_FILA': hash_fila,
+        'DUPLICADO_EXACTO': exacto,
+        'HASH_CLAVE': hash_clave,
+        'DUPLICADO_CLAVE': repetida & clave_completa,
+        'CLAVE_INCOMPLETA': ~clave_completa,
+    }, index=df.index)
+
+
+def nuevos_hashes_previos():
+    """Hashes de filas y de claves completas ya vistos en archivos anteriores (p. ej. otros períodos), como arrays ordenados."""
+    return {'filas': np.empty(0, dtype=np.uint64), 'claves': np.empty(0, dtype=np.uint64)}
+
+
+def detectar_repetidos_previos(deteccion, hashes_previos):
+    """
+    Agrega a `deteccion` las filas que repiten una fila (DUPLICADO_PREVIO_EXACTO) o, si no, una clave completa
+    (DUPLICADO_PREVIO_CLAVE) de archivos anteriores, y suma los hashes de `deteccion` a `hashes_previos` (se modifica)
+    para los siguientes. Solo se guardan hashes de 64 bits, no datos de las filas.
+    """
+    hash_fila = deteccion['HASH_FILA'].to_numpy(dtype=np.uint64)
+    hash_clave = deteccion['HASH_CLAVE'].to_numpy(dtype=np.uint64)
+    completa = ~deteccion['CLAVE_INCOMPLETA'].to_numpy()
+
+    previo_exacto = np.isin(hash_fila, hashes_previos['filas'])
+    previo_clave = np.isin(hash_clave, hashes_previos['claves']) & completa & ~previo_exacto
+
+    hashes_previos['filas'] = np.union1d(hashes_previos['filas'], hash_fila)
+    hashes_previos['claves'] = np.union1d(hashes_previos['claves'], hash_clave[completa])
+    return deteccion.assign(DUPLICADO_PREVIO_EXACTO=previo_exacto, DUPLICADO_PREVIO_CLAVE=previo_clave)
+
+
+def resumen_duplicados(deteccion):
+    """
+    Cantidades para mostrar: filas, duplicados exactos, filas que repiten la clave de otra (sin contar la primera
+    de cada clave, igual que lo que elimina el nivel 'clave'), claves repetidas y claves incompletas.
+    """
+    por_clave = deteccion['DUPLICADO_CLAVE'] & ~deteccion['DUPLICADO_EXACTO']
+    grupos_clave = int(deteccion.loc[por_clave, 'HASH_CLAVE'].nunique())
+    resumen = {
+        'filas': len(deteccion),
+        'exactos': int(deteccion['DUPLICADO_EXACTO'].sum()),
+        'clave': int(por_clave.sum()) - grupos_clave,
+        'grupos_clave': grupos_clave,
+        'clave_incompleta': int(deteccion['CLAVE_INCOMPLETA'].sum()),
+    }
+    if 'DUPLICADO_PREVIO_EXACTO' in deteccion.columns:
+        # Repetidos de archivos anteriores que no son ya duplicados exactos dentro del mismo archivo
+        nuevas = ~deteccion['DUPLICADO_EXACTO']
+        resumen['previos_exactos'] = int((deteccion['DUPLICADO_PREVIO_EXACTO'] & nuevas).sum())
+        resumen['previos_clave'] = int((deteccion['DUPLICADO_PREVIO_CLAVE'] & nuevas).sum())
+    return resumen
+
+
+def eliminar_duplicados(df, deteccion, nivel='exactos'):
+    """
+    Retorna `df` sin duplicados según `nivel` (ver NIVELES_ELIMINACION):
+    'exactos' conserva la primera de cada grupo de filas idénticas; 'clave' además conserva solo la
+    primera fila de cada clave completa repetida. Si `deteccion` pasó por `detectar_repetidos_previos`,
+    también se eliminan las filas (o claves, con 'clave') que ya estaban en archivos anteriores.
+    """
+    if nivel == 'ninguno':
+        return df
+    conservar = ~deteccion['DUPLICADO_EXACTO'].to_numpy()
+    if 'DUPLICADO_PREVIO_EXACTO' in deteccion.columns:
+        conservar &= ~deteccion['DUPLICADO_PREVIO_EXACTO'].to_numpy()
+        if nivel == 'clave':
+            conservar &= ~deteccion['DUPLICADO_PREVIO_CLAVE'].to_numpy()
+    if nivel == 'clave':
+        completa = np.flatnonzero(~deteccion['CLAVE_INCOMPLETA'].to_numpy())
+        repetida = np.zeros(len(df), dtype=bool)
+        repetida[completa] = pd.Series(deteccion['HASH_CLAVE'].to_numpy()[completa]).duplicated(keep='first').to_numpy()
+        conservar &= ~repetida
+    return df[conservar]
+
+
+def reporte_duplicados(df, deteccion, origen=None):
+    """
+    DataFrame con las filas involucradas en algún duplicado (incluida la primera aparición), agrupadas,
+    con el tipo de duplicado y, si se indica `origen`, el archivo del que proviene cada fila.
+    """
+    fila_repetida = deteccion['HASH_FILA'].duplicated(keep=False)
+    involucradas = fila_repetida | deteccion['DUPLICADO_CLAVE']
+    reporte = df[involucradas.to_numpy()].copy()
+    detalle = deteccion[involucradas.to_numpy()]
+
+    tipo = np.where(fila_repetida[involucradas].to_numpy(), "Exacto", "Misma clave")
+    grupo_hash = np.where(detalle['DUPLICADO_CLAVE'].to_numpy(), detalle['HASH_CLAVE'].to_numpy(), detalle['HASH_FILA'].to_numpy())
+    grupo = pd.Series(pd.factorize(grupo_hash)[0] + 1, index=reporte.index)
+
+    reporte.insert(0, 'Tipo de duplicado', tipo)
+    reporte.insert(0, 'Grupo', grupo)
+    if origen is not None:
+        reporte.insert(2, 'Archivo', origen[involucradas.to_numpy()].to_numpy())
+    return reporte.sort_values('Grupo', kind='stable')
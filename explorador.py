@@ -0,0 +1,132 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Explorador de resultados del lado del servidor: el resultado completo queda en la sesión y solo se
+# envía al navegador la página pedida, ya filtrada y ordenada.
+
+# Columnas internas que usa el explorador para filtrar. La plantilla del usuario puede nombrarlas distinto,
+# por eso se ubican a través del mapeo de la plantilla (columna de plantilla -> columna interna).
+COLUMNAS_EXPLORADOR = {
+    'alerta': 'ALERTA_DIFERENCIA_FINAL',
+    'regimen': 'COD_REGIMEN_ONVIO',
+    'cuit': 'CUIT del Proveedor',
+}
+
+# Columnas internas de importe que se pueden usar para el filtro por rango
+COLUMNAS_IMPORTE = {
+    'Importe Percepción': 'PERCEPCION_FINAL',
+    'Importe Total del Comprobante': 'Importe Total del Comprobante',
+    'Importe Neto': 'Importe Neto',
+    'IVA Inscripto': 'IVA Inscripto',
+}
+
+TAMANOS_PAGINA = [25, 50, 100, 250]
+
+
+def _columna_plantilla(column_map_template, columna_interna):
+    """Retorna la primera columna de la plantilla mapeada a `columna_interna`, o None si no está mapeada."""
+    for template_col_name, internal_mapped_col_name in column_map_template.items():
+        if internal_mapped_col_name == columna_interna:
+            return template_col_name
+    return None
+
+
+def preparar_explorador(resultado_df, column_map_template, cruce_df=None):
+    """
+    Precalcula una sola vez (al terminar el procesamiento) las columnas auxiliares para filtrar:
+    alerta presente, código de régimen, CUIT normalizado e importes numéricos.
+    Con `cruce_df` (el detalle de cruce del motor vectorizado) se agregan a la vista el método y la confianza del
+    cruce de cada comprobante, aunque la plantilla no los tenga, y se puede filtrar por método.
+    Retorna un dict que se guarda en `st.session_state` junto con el resultado.
+    """
+    n = len(resultado_df)
+    if cruce_df is not None:
+        metodos = cruce_df['Método de Cruce'].to_numpy(dtype=object)
+        vista_df = resultado_df.assign(**{
+            col: cruce_df[col].to_numpy() for col in ['Método de Cruce', 'Confianza de Cruce'] if col not in resultado_df.columns
+        })
+    else:
+        metodos = np.full(n, "", dtype=object)
+        vista_df = resultado_df
+    columnas = {rol: _columna_plantilla(column_map_template, interna) for rol, interna in COLUMNAS_EXPLORADOR.items()}
+
+    if columnas['alerta']:
+        alertas = resultado_df[columnas['alerta']]
+        tiene_alerta = (alertas.notna() & (alertas.astype(str).str.strip() != "")).to_numpy()
+    else:
+        tiene_alerta = np.zeros(n, dtype=bool)
+
+    if columnas['regimen']:
+        regimenes = resultado_df[columnas['regimen']].astype(object).where(resultado_df[columnas['regimen']].notna(), "")
+    else:
+        regimenes = pd.Series([""] * n, index=resultado_df.index, dtype=object)
+
+    if columnas['cuit']:
+        cuits = resultado_df[columnas['cuit']]
+        cuits_normalizados = cuits.astype(object).where(cuits.notna(), "").astype(str).str.replace(r'\D', '', regex=True)
+    else:
+        cuits_normalizados = pd.Series([""] * n, index=resultado_df.index, dtype=str)
+
+    importes = {}
+    for etiqueta, interna in COLUMNAS_IMPORTE.items():
+        template_col_name = _columna_plantilla(column_map_template, interna)
+        if template_col_name:
+            importes[etiqueta] = pd.to_numeric(resultado_df[template_col_name], errors='coerce').to_numpy(dtype=float)
+
+    return {
+        'df': vista_df,
+        'tiene_alerta': tiene_alerta,
+        'regimenes': regimenes,
+        'opciones_regimen': sorted(r for r in regimenes.unique() if r != ""),
+        'cuits': cuits_normalizados,
+        'importes': importes,
+        'metodos': metodos,
+        'opciones_metodo': sorted(m for m in set(metodos) if m != ""),
+    }
+
+
+def filtrar(explorador, solo_alertas=False, codigos_regimen=None, cuit=None, columna_importe=None, importe_min=None, importe_max=None, metodos_cruce=None):
+    """Retorna una máscara booleana (numpy) con las filas que cumplen todos los filtros indicados."""
+    mascara = np.ones(len(explorador['df']), dtype=bool)
+    if solo_alertas:
+        mascara &= explorador['tiene_alerta']
+    if codigos_regimen:
+        mascara &= explorador['regimenes'].isin(codigos_regimen).to_numpy()
+    if metodos_cruce:
+        mascara &= np.isin(explorador['metodos'], metodos_cruce)
+    cuit_digitos = "".join(c for c in str(cuit or "") if c.isdigit())
+    if cuit_digitos:
+        mascara &= explorador['cuits'].str.contains(cuit_digitos, regex=False).to_numpy()
+    if columna_importe in explorador['importes'] and (importe_min is not None or importe_max is not None):
+        importes = explorador['importes'][columna_importe]
+        if importe_min is not None:
+            mascara &= importes >= importe_min
+        if importe_max is not None:
+            mascara &= importes <= importe_max
+    return mascara
+
+
+def obtener_pagina(explorador, mascara, pagina=1, tamano=50, orden=None, ascendente=True):
+    """
+    Retorna (pagina_df, total_filas, total_paginas) con la página pedida de las filas filtradas.
+    Solo se ordenan las filas filtradas; los importes se ordenan por su valor numérico y el resto como texto.
+    """
+    posiciones = np.flatnonzero(mascara)
+    total_filas = len(posiciones)
+    total_paginas = max(1, math.ceil(total_filas / tamano))
+    pagina = min(max(1, pagina), total_paginas)
+
+    df = explorador['df']
+    if orden is not None and orden in df.columns and total_filas:
+        valores = pd.to_numeric(df[orden].iloc[posiciones], errors='coerce')
+        if valores.isna().all() and df[orden].iloc[posiciones].notna().any():
+            # Columna de texto: ordenar como texto, con los vacíos al final
+            texto = df[orden].iloc[posiciones].astype(object)
+            valores = texto.where(texto.notna(), None).map(lambda v: None if v is None else str(v))
+        orden_posiciones = valores.reset_index(drop=True).sort_values(ascending=ascendente, na_position='last', kind='stable').index.to_numpy()
+        posiciones = posiciones[orden_posiciones]
+
+    inicio = (pagina - 1) * tamano
+    return df.iloc[posiciones[inicio:inicio + tamano]], total_filas, total_paginas
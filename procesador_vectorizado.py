@@ -0,0 +1,372 @@
+import pandas as pd
+import numpy as np
+import logging
+import traceback
+
+from procesador import (
+    normalizar_numero,
+    extraer_tipo_y_letra_comprobante,
+    determinar_situacion_iva,
+    mapear_codigo_regimen,
+)
+
+# Motor optimizado: produce la misma plantilla que `procesador.process_and_fill_template`
+# (el motor de referencia, fila por fila) pero trabajando por columnas completas.
+# Las funciones de clasificación y mapeo se reutilizan tal cual, aplicadas una sola vez por
+# cada valor distinto, para que el resultado sea idéntico celda por celda.
+# Cualquier cambio acá debe pasar `python verificar_equivalencia.py` antes de usarse.
+
+# Nombres estándar internos (mismos que usa el motor de referencia)
+COLUMNAS_ESTANDAR_COMP = {
+    'fecha_emision': 'Fecha de Emisión',
+    'tipo_comprobante': 'Tipo de Comprobante (AFIP - Mis Comprobantes)',
+    'punto_venta': 'Punto de Venta',
+    'numero_comprobante': 'Número',
+    'cuit_proveedor': 'CUIT del Proveedor',
+    'razon_social_proveedor': 'Razón social del Provedor',
+    'importe_neto': 'Importe Neto',
+    'iva_inscripto': 'IVA Inscripto',
+    'importe_exento': 'Importe Exento',
+    'impuestos_internos_no_gravado': 'Impuestos Internos / No Gravado',
+    'importe_total_comprobante': 'Importe Total del Comprobante',
+    'numero_cai': 'Número de CAI',
+    'cotizacion': 'Cotización',
+    'moneda': 'Moneda',
+    'codigo_concepto_articulo': 'Código de Concepto / Artículo',
+    'provincia_iibb': 'Provincia IIBB',
+}
+
+COLUMNAS_ESTANDAR_PERC = {
+    'cuit_agente': 'CUIT Agente Ret./Perc.',
+    'numero_comprobante': 'Número Comprobante',
+    'impuesto': 'Impuesto',
+    'descripcion_impuesto': 'Descripción Impuesto',
+    'regimen': 'Régimen',
+    'descripcion_regimen': 'Descripción Régimen',
+    'importe_percepcion': 'Importe Ret./Perc.',
+}
+
+# Campos de comprobantes que forman la clave del cruce: sin ellos no se puede procesar
+CAMPOS_CLAVE_COMP = ['numero_comprobante', 'cuit_proveedor']
+
+
+def _textos(serie):
+    """Convierte una serie a textos con `str()` (igual que el motor de referencia), dejando None en los nulos."""
+    valores = serie.astype(object)
+    nulos = valores.isna().to_numpy()
+    textos = np.empty(len(valores), dtype=object)
+    textos[~nulos] = [str(v) for v in valores.to_numpy()[~nulos]]
+    return textos, nulos
+
+
+def nuevas_caches():
+    """
+    Caches de clasificación de tipos y mapeo de regímenes para compartir entre varias llamadas al motor
+    (p. ej. los períodos de un mismo año). Solo guardan resultados por texto de tipo de comprobante y por
+    combinación de régimen/impuesto, que se repiten de un período a otro y no crecen con la cantidad de filas.
+    """
+    return {'tipo_y_letra': {}, 'situacion_iva': {}, 'regimen': {}}
+
+
+def _aplicar_por_valor_unico(serie, funcion, resultado_nulo, cache=None):
+    """
+    Aplica `funcion` una sola vez por cada texto distinto de la serie y expande el resultado a todas las filas.
+    Las filas nulas reciben `resultado_nulo`. Si se pasa `cache` (dict texto -> resultado), se reutilizan los
+    resultados ya calculados y se agregan los nuevos. Retorna un array de objetos alineado con la serie.
+    """
+    if pd.api.types.is_integer_dtype(serie.dtype) or isinstance(serie.dtype, pd.StringDtype):
+        # Un solo tipo de dato: valores iguales tienen el mismo str(), se puede agrupar sin convertir
+        codigos, unicos = pd.factorize(serie)
+        unicos = [str(v) for v in unicos]
+    else:
+        # Tipos mezclados (1, 1.0, '1') o floats (-0.0 y 0.0): agrupar por el texto para no unir valores con distinto str()
+        textos, nulos = _textos(serie)
+        codigos = np.full(len(textos), -1, dtype=np.intp)
+        unicos = []
+        if (~nulos).any():
+            codigos[~nulos], unicos = pd.factorize(textos[~nulos])
+    resultados = np.empty(len(unicos) + 1, dtype=object)
+    for i, texto in enumerate(unicos):
+        if cache is None:
+            resultados[i] = funcion(texto)
+        else:
+            if texto not in cache:
+                cache[texto] = funcion(texto)
+            resultados[i] = cache[texto]
+    resultados[-1] = resultado_nulo  # posición del código -1 (nulos)
+    return resultados[codigos]
+
+
+def normalizar_serie(serie):
+    """Equivalente vectorizado de `serie.apply(normalizar_numero)`: una llamada por cada valor distinto."""
+    return pd.Series(_aplicar_por_valor_unico(serie, normalizar_numero, ""), index=serie.index, dtype=object)
+
+
+def digitos_serie(serie):
+    """
+    Dígitos de cada valor con operaciones de texto vectorizadas (sin una llamada de Python por valor), para claves
+    de hash y cruces aproximados. Igual que `normalizar_numero`, salvo que los enteros guardados como float
+    (12.0, habitual cuando Excel trae celdas vacías en la columna) no suman el '0' del decimal.
+    No reemplaza a `normalizar_serie` en la KEY del cruce exacto, que debe coincidir con el motor de referencia.
+    """
+    textos = serie.astype(object).where(serie.notna(), "").astype(str).str.strip()
+    return textos.str.replace(r'^(\d+)\.0+$', r'\1', regex=True).str.replace(r'\D', '', regex=True).astype(object)
+
+
+def sin_ceros_izquierda(digitos):
+    """Quita los ceros a la izquierda de una serie de cadenas de dígitos (un valor de solo ceros queda como '0')."""
+    return digitos.str.replace(r'^0+(?=\d)', '', regex=True)
+
+
+def numeros_serie(serie):
+    """
+    Normalización de "mismo comprobante" compartida por la detección de duplicados y el cruce alternativo: los
+    dígitos de cada valor (ver `digitos_serie`) sin ceros a la izquierda, así '0001', '1' y 1.0 son el mismo número.
+    """
+    return sin_ceros_izquierda(digitos_serie(serie))
+
+
+def _normalizar_columna(df, columna):
+    """Equivalente vectorizado de `df[columna].apply(normalizar_numero)`."""
+    if columna not in df.columns:
+        return ""
+    return normalizar_serie(df[columna])
+
+
+def campos_clave_faltantes(column_map_comp, columnas):
+    """
+    Retorna los nombres estándar de los campos clave (número y CUIT del proveedor) que no llegarían al cruce con
+    este mapeo: sin columna elegida, con una columna que no está en el archivo, o con una columna que también se
+    eligió para otro campo (al renombrar gana el último y la columna clave desaparece).
+    """
+    faltantes = []
+    for campo in CAMPOS_CLAVE_COMP:
+        columna = column_map_comp.get(campo)
+        compartida = any(column_map_comp.get(otro) == columna for otro in COLUMNAS_ESTANDAR_COMP if otro != campo)
+        if columna is None or columna not in columnas or compartida:
+            faltantes.append(COLUMNAS_ESTANDAR_COMP[campo])
+    return faltantes
+
+
+def columnas_repetidas(columnas, column_map, columnas_estandar):
+    """
+    Retorna los nombres que quedarían repetidos al renombrar `columnas` con el mapeo (p. ej. dos campos apuntando
+    a la misma columna cuando otra ya tiene el nombre estándar del segundo campo).
+    """
+    renombres = {column_map.get(k): v for k, v in columnas_estandar.items()}
+    nombres = pd.Series([renombres.get(c, c) for c in columnas], dtype=object)
+    return list(nombres[nombres.duplicated()].unique())
+
+
+def process_and_fill_template_vectorizado(comprobantes_df, percepciones_df, template_df, column_map_comp, column_map_perc, column_map_template, cruce_alternativo=False, caches=None, cruce_por_importe=False, detalle_cruce=None):
+    """
+    Versión vectorizada de `process_and_fill_template`. Misma firma y mismo resultado.
+    Con `cruce_alternativo=True` los comprobantes sin coincidencia exacta se vuelven a buscar con
+    `cruce_alternativo.cruzar_sin_coincidencia` (el resultado ya no es comparable con el motor de referencia);
+    la pasada por importe, de menor confianza, solo se aplica con `cruce_por_importe=True`.
+    Si se pasa `detalle_cruce` (dict), se completa con 'cruce': un DataFrame alineado con las filas de la
+    plantilla con el CUIT, el número y el método y la confianza del cruce de cada comprobante, aunque la plantilla
+    no tenga columnas para ellos.
+    `caches` (ver `nuevas_caches`) permite reutilizar clasificaciones y mapeos entre llamadas.
+    """
+    caches = caches if caches is not None else nuevas_caches()
+    try:
+        # El motor de referencia falla al registrar una diferencia si falta el número o el CUIT (y solo si hay
+        # alguna); acá se rechaza siempre, antes de armar una plantilla con la clave vacía o corrida de columna.
+        # Lo mismo con mapeos que dejan columnas repetidas, donde la referencia arma columnas sin sentido.
+        faltantes = campos_clave_faltantes(column_map_comp, comprobantes_df.columns)
+        if faltantes:
+            raise KeyError(faltantes[0])
+        for df, column_map, columnas_estandar in [(comprobantes_df, column_map_comp, COLUMNAS_ESTANDAR_COMP), (percepciones_df, column_map_perc, COLUMNAS_ESTANDAR_PERC)]:
+            repetidas = columnas_repetidas(df.columns, column_map, columnas_estandar)
+            if repetidas:
+                raise ValueError(f"la columna '{repetidas[0]}' queda repetida después del mapeo (hay dos campos asignados a la misma columna)")
+
+        # --- 1. Renombrar columnas de entrada a nombres estándar para el procesamiento interno ---
+        df_comp = comprobantes_df.rename(columns={column_map_comp.get(k): v for k, v in COLUMNAS_ESTANDAR_COMP.items()})
+        for col in ['Número de CAI', 'Cotización', 'Moneda', 'Código de Concepto / Artículo', 'Provincia IIBB']:
+            if col not in df_comp.columns:
+                df_comp[col] = np.nan
+
+        df_perc = percepciones_df.rename(columns={column_map_perc.get(k): v for k, v in COLUMNAS_ESTANDAR_PERC.items()})
+
+        # --- 2. Normalización y Limpieza de Datos ---
+        numeric_cols_comp = ['Importe Neto', 'IVA Inscripto', 'Importe Exento', 'Impuestos Internos / No Gravado', 'Importe Total del Comprobante']
+        for col in numeric_cols_comp:
+            if col in df_comp.columns:
+                df_comp[col] = pd.to_numeric(df_comp[col], errors='coerce').fillna(0)
+
+        if 'Importe Ret./Perc.' in df_perc.columns:
+            df_perc['Importe Ret./Perc.'] = pd.to_numeric(df_perc['Importe Ret./Perc.'], errors='coerce').fillna(0)
+
+        # Tipo, letra y situación IVA: una llamada por cada texto de comprobante distinto
+        col_tipo = 'Tipo de Comprobante (AFIP - Mis Comprobantes)'
+        tipos_texto = df_comp[col_tipo] if col_tipo in df_comp.columns else pd.Series(None, index=df_comp.index, dtype=object)
+        tipo_y_letra = _aplicar_por_valor_unico(tipos_texto, extraer_tipo_y_letra_comprobante, extraer_tipo_y_letra_comprobante(None), caches['tipo_y_letra'])
+        df_comp['TIPO_COMPROBANTE_ESTANDAR'] = pd.Series([tipo for tipo, _ in tipo_y_letra], index=df_comp.index, dtype=object)
+        df_comp['LETRA_COMPROBANTE_ESTANDAR'] = pd.Series([letra for _, letra in tipo_y_letra], index=df_comp.index, dtype=object)
+
+        # determinar_situacion_iva solo usa el CUIT para saber si es nulo
+        situacion_por_texto = _aplicar_por_valor_unico(tipos_texto, lambda texto: determinar_situacion_iva("", texto), "RI", caches['situacion_iva'])
+        situacion = pd.Series(situacion_por_texto, index=df_comp.index, dtype=object)
+        if 'CUIT del Proveedor' in df_comp.columns:
+            situacion = situacion.where(df_comp['CUIT del Proveedor'].notna(), "RI")
+        else:
+            situacion[:] = "RI"
+        df_comp['SITUACION_IVA_ESTANDAR'] = situacion
+
+        # Normalizar CUITs y números de comprobante para el cruce
+        df_comp['CUIT_NORMALIZADO'] = _normalizar_columna(df_comp, 'CUIT del Proveedor')
+        df_comp['NUMERO_COMPROBANTE_NORMALIZADO'] = _normalizar_columna(df_comp, 'Número')
+
+        df_perc['CUIT_AGENTE_NORMALIZADO'] = _normalizar_columna(df_perc, 'CUIT Agente Ret./Perc.')
+        df_perc['NUMERO_COMPROBANTE_PERC_NORMALIZADO'] = _normalizar_columna(df_perc, 'Número Comprobante')
+
+        df_comp['KEY'] = df_comp['CUIT_NORMALIZADO'] + '|' + df_comp['NUMERO_COMPROBANTE_NORMALIZADO']
+        df_perc['KEY'] = df_perc['CUIT_AGENTE_NORMALIZADO'] + '|' + df_perc['NUMERO_COMPROBANTE_PERC_NORMALIZADO']
+
+        mensaje_cruce = ""
+        if cruce_alternativo:
+            # Importado acá porque cruce_alternativo usa normalizar_serie de este módulo
+            from cruce_alternativo import cruzar_sin_coincidencia
+
+            exacto = df_comp['KEY'].isin(set(df_perc['KEY'])).to_numpy()
+            metodos = np.where(exacto, 'EXACTO', '').astype(object)
+            confianzas = np.where(exacto, 1.0, np.nan)
+
+            asociados = cruzar_sin_coincidencia(df_comp, df_perc, por_importe=cruce_por_importe)
+            if len(asociados):
+                posiciones = asociados['POSICION'].to_numpy(dtype=int)
+                claves = df_comp['KEY'].to_numpy(dtype=object).copy()
+                claves[posiciones] = asociados['KEY_ALTERNATIVA'].to_numpy(dtype=object)
+                df_comp['KEY'] = claves
+                metodos[posiciones] = asociados['METODO_CRUCE'].to_numpy(dtype=object)
+                confianzas[posiciones] = asociados['CONFIANZA_CRUCE'].to_numpy(dtype=float)
+                por_metodo = asociados['METODO_CRUCE'].value_counts()
+                detalle = ", ".join(f"{metodo}: {cantidad}" for metodo, cantidad in por_metodo.items())
+                mensaje_cruce = f". Cruce alternativo: {len(asociados)} comprobantes asociados sin coincidencia exacta ({detalle})"
+                logging.info(f"Cruce alternativo: {len(asociados)} comprobantes asociados ({detalle}).")
+            df_comp['METODO_CRUCE'] = metodos
+            df_comp['CONFIANZA_CRUCE'] = confianzas
+            if detalle_cruce is not None:
+                detalle_cruce['cruce'] = pd.DataFrame({
+                    'CUIT del Proveedor': df_comp['CUIT del Proveedor'].to_numpy(dtype=object),
+                    'Número': df_comp['Número'].to_numpy(dtype=object),
+                    'Método de Cruce': metodos,
+                    'Confianza de Cruce': confianzas,
+                })
+
+        # --- 3. Procesamiento y Cruce de Percepciones ---
+        percepciones_agrupadas = df_perc.groupby('KEY')['Importe Ret./Perc.'].sum().reset_index()
+        percepciones_agrupadas.rename(columns={'Importe Ret./Perc.': 'SUMA_PERCEPCIONES'}, inplace=True)
+
+        percepciones_info = pd.DataFrame({'KEY': percepciones_agrupadas['KEY']})
+        for origen, destino in [
+            ('Impuesto', 'impuesto_perc_consolidado'),
+            ('Descripción Impuesto', 'desc_impuesto_perc_consolidado'),
+            ('Régimen', 'regimen_perc_consolidado'),
+            ('Descripción Régimen', 'desc_regimen_perc_consolidado'),
+        ]:
+            percepciones_info[destino] = _consolidar_textos(df_perc, origen, percepciones_agrupadas['KEY'])
+
+        percepciones_completas = percepciones_agrupadas.merge(percepciones_info, on='KEY', how='left')
+
+        resultado_proceso = df_comp.merge(percepciones_completas, on='KEY', how='left')
+
+        # --- 4. Cálculo de Diferencias y Asignación de Percepciones ---
+        importe_neto = resultado_proceso['Importe Neto'].fillna(0) if 'Importe Neto' in resultado_proceso.columns else 0
+        iva_inscripto = resultado_proceso['IVA Inscripto'].fillna(0) if 'IVA Inscripto' in resultado_proceso.columns else 0
+        importe_exento = resultado_proceso['Importe Exento'].fillna(0) if 'Importe Exento' in resultado_proceso.columns else 0
+        imp_int_no_grav = resultado_proceso['Impuestos Internos / No Gravado'].fillna(0) if 'Impuestos Internos / No Gravado' in resultado_proceso.columns else 0
+        importe_total_comp = resultado_proceso['Importe Total del Comprobante'].fillna(0) if 'Importe Total del Comprobante' in resultado_proceso.columns else 0
+        if len(resultado_proceso) and not isinstance(importe_total_comp, pd.Series):
+            # El motor de referencia también falla si hay comprobantes sin columna de total
+            raise KeyError('Importe Total del Comprobante')
+
+        resultado_proceso['TOTAL_CALCULADO_BASE'] = importe_neto + iva_inscripto + importe_exento + imp_int_no_grav
+        resultado_proceso['DIFERENCIA_PERCEPCION'] = importe_total_comp - resultado_proceso['TOTAL_CALCULADO_BASE']
+
+        percepcion_final = resultado_proceso['SUMA_PERCEPCIONES'].fillna(0)
+        # Si no se encontró percepción en el archivo de percepciones pero hay una diferencia positiva
+        asignar_diferencia = (resultado_proceso['DIFERENCIA_PERCEPCION'] > 0.05) & (percepcion_final == 0)
+        if asignar_diferencia.any():
+            logging.info(f"Detectadas {int(asignar_diferencia.sum())} diferencias sin percepción informada. Asignando la diferencia como percepción.")
+        resultado_proceso['PERCEPCION_FINAL'] = percepcion_final.where(~asignar_diferencia, resultado_proceso['DIFERENCIA_PERCEPCION'])
+
+        # Verificar si el total del comprobante cierra con la percepción final (tolerancia de 0.1 para redondeo)
+        diferencia_final = importe_total_comp - (resultado_proceso['TOTAL_CALCULADO_BASE'] + resultado_proceso['PERCEPCION_FINAL'])
+        con_alerta = (diferencia_final.abs() > 0.1).to_numpy()
+        alertas = np.full(len(resultado_proceso), "", dtype=object)
+        alertas[con_alerta] = [f"Alerta: Diferencia final de {d:.2f}" for d in diferencia_final.to_numpy()[con_alerta]]
+        resultado_proceso['ALERTA_DIFERENCIA_FINAL'] = alertas
+
+        # --- 5. Mapeo de Códigos de Régimen a formato ONVIO ---
+        codigos = np.full(len(resultado_proceso), "", dtype=object)
+        articulos = np.full(len(resultado_proceso), "", dtype=object)
+        descripciones = np.full(len(resultado_proceso), "", dtype=object)
+
+        con_percepcion = (resultado_proceso['PERCEPCION_FINAL'] > 0).to_numpy()
+        if con_percepcion.any():
+            # mapear_codigo_regimen solo depende del texto de cada argumento: una llamada por combinación distinta
+            argumentos = zip(*(
+                resultado_proceso.loc[con_percepcion, col].astype(object).map(str).to_numpy()
+                for col in ['regimen_perc_consolidado', 'desc_regimen_perc_consolidado', 'impuesto_perc_consolidado', 'desc_impuesto_perc_consolidado']
+            ))
+            mapeos = caches['regimen']
+            filas = np.flatnonzero(con_percepcion)
+            for posicion, args in zip(filas, argumentos):
+                mapping = mapeos.get(args)
+                if mapping is None:
+                    mapping = mapeos[args] = mapear_codigo_regimen(*args)
+                codigos[posicion] = mapping['codigo']
+                articulos[posicion] = mapping['articulo']
+                descripciones[posicion] = mapping['descripcion']
+
+        resultado_proceso['COD_REGIMEN_ONVIO'] = codigos
+        resultado_proceso['ART_REGIMEN_ONVIO'] = articulos
+        resultado_proceso['DESC_REGIMEN_ONVIO'] = descripciones
+
+        # --- 6. Preparar la Plantilla Final para ONVIO usando las columnas mapeadas ---
+        columnas_plantilla = list(template_df.columns) + [c for c in column_map_template if c not in template_df.columns]
+        datos = {}
+        for template_col_name in columnas_plantilla:
+            internal_mapped_col_name = column_map_template.get(template_col_name)
+            if internal_mapped_col_name is not None and internal_mapped_col_name in resultado_proceso.columns:
+                valores = resultado_proceso[internal_mapped_col_name].astype(object)
+                datos[template_col_name] = valores.where(valores.notna(), None).to_numpy()
+            else:
+                datos[template_col_name] = np.full(len(resultado_proceso), None, dtype=object)
+        template_filled = pd.DataFrame(datos, columns=columnas_plantilla)
+
+        return template_filled, "Procesamiento completado correctamente" + mensaje_cruce
+
+    except KeyError as ke:
+        error_msg = f"Error de datos: La columna esperada '{ke}' no se encontró después del mapeo. Esto podría deberse a un mapeo incorrecto o datos faltantes en tus archivos de origen."
+        logging.error(error_msg)
+        logging.error(traceback.format_exc())
+        return None, error_msg
+    except Exception as e:
+        error_msg = f"Error inesperado durante el procesamiento de datos: {e}. Por favor, revisa los archivos y las selecciones de columnas."
+        logging.error(error_msg)
+        logging.error(traceback.format_exc())
+        return None, error_msg
+
+
+def _consolidar_textos(df_perc, origen, claves):
+    """
+    Equivalente de `groupby('KEY')[origen].agg(lambda x: '|'.join(x.dropna().astype(str).unique()) ...)` sin
+    lambdas por grupo: los valores distintos de cada clave se unen con '|' en orden de aparición.
+    Retorna una serie alineada con `claves`, con None donde la clave no tiene valores.
+    """
+    valores = df_perc[['KEY', origen]].dropna(subset=[origen])
+    textos, _ = _textos(valores[origen])
+    distintos = pd.DataFrame({'KEY': valores['KEY'].to_numpy(), 'TEXTO': textos}).drop_duplicates()
+    # La mayoría de las claves tiene un solo valor: solo se unen con '|' las que tienen varios
+    varios = distintos['KEY'].duplicated(keep=False).to_numpy()
+    consolidado = pd.Series(distintos['TEXTO'].to_numpy(dtype=object)[~varios], index=distintos['KEY'].to_numpy()[~varios], dtype=object)
+    if varios.any():
+        unidos = distintos[varios].groupby('KEY', sort=False)['TEXTO'].agg('|'.join)
+        consolidado = pd.concat([consolidado, unidos.astype(object)])
+    consolidado = consolidado.reindex(claves)
+    # Construir la serie desde objetos de Python para que pandas infiera el mismo dtype que en el agg original
+    return pd.Series([v if isinstance(v, str) else None for v in consolidado.astype(object)], index=claves.index)
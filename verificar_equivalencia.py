@@ -0,0 +1,536 @@
+import argparse
+import logging
+import math
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from procesador import ONVIO_REGIMES_MAPPING, process_and_fill_template
+from duplicados import detectar_duplicados, detectar_repetidos_previos, eliminar_duplicados, nuevos_hashes_previos, resumen_duplicados
+from procesador_vectorizado import (
+    COLUMNAS_ESTANDAR_COMP, COLUMNAS_ESTANDAR_PERC, campos_clave_faltantes, columnas_repetidas, process_and_fill_template_vectorizado,
+)
+
+# Arnés de pruebas diferenciales entre el motor de referencia (fila por fila) y los motores optimizados.
+# Genera entradas aleatorias parecidas a las exportaciones de AFIP, las procesa con todos los motores y
+# falla ante cualquier diferencia celda por celda en la plantilla completada. Los mismos casos se usan
+# para la comparación de rendimiento.
+#
+# Uso:
+#   python verificar_equivalencia.py                      # 200 casos chicos, semilla 0
+#   python verificar_equivalencia.py --casos 50 --filas 500 --semilla 7
+#   python verificar_equivalencia.py --rendimiento --filas 2000
+#
+# Además se verifican casos fijos del cruce alternativo (motor vectorizado con cruce_alternativo=True), que no
+# tiene equivalente en el motor de referencia: cada comprobante debe quedar con el método esperado. Lo mismo con
+# casos fijos de la detección de duplicados: cantidades esperadas y filas que conserva cada nivel de eliminación.
+
+MOTOR_REFERENCIA = 'referencia'
+
+# Motores a comparar contra la referencia. Un motor nuevo se registra acá.
+MOTORES = {
+    MOTOR_REFERENCIA: process_and_fill_template,
+    'vectorizado': process_and_fill_template_vectorizado,
+}
+
+# Tipos de comprobante reales y casos raros (códigos numéricos, abreviaturas, minúsculas, vacíos)
+TIPOS_COMPROBANTE = [
+    '1 - Factura A', '6 - Factura B', '11 - Factura C', '3 - Nota de Crédito A', '8 - Nota de Crédito B',
+    '2 - Nota de Débito A', 'FACTURA A', 'factura b', 'Factura C', 'NOTA DE CREDITO A', 'NOTA DE DEBITO B',
+    'NCA', 'NCB', 'NDC', 'Recibo A', 'RECIBO C', 'Ticket', 'Tique Factura A', 'TK', 'Factura M',
+    '51 - Factura M', 'Comprobante de Compra de Bienes Usados', 'Liquidación de Servicios Públicos', ' A ',
+    'Otro B', 'Factura  A', 'FACTURA E', '', '   ', None, np.nan, 1, 6.0, 'Nota de Crédito Electrónica MiPyMEs (FCE) A',
+]
+
+# Regímenes: palabras clave del diccionario, códigos directos, genéricos y desconocidos
+REGIMENES_CONOCIDOS = sorted({kw for datos in ONVIO_REGIMES_MAPPING.values() for kw in datos['keywords_afip']})
+REGIMENES_RAROS = ['493', '767', '999', '0', '830 | K4', 'IVA', 'Ingresos Brutos', 'Ganancias', 'GANANCIA', 'VALOR AGREGADO', 'xyz', '', None, np.nan, 493, 212.0]
+IMPUESTOS = ['IVA', 'Ingresos Brutos', 'Impuesto a las Ganancias', 'IIBB', '217', '767', 'SUSS', '', None, np.nan, 30]
+DESC_IMPUESTOS = ['Impuesto al Valor Agregado', 'Percepción IIBB CABA', 'Ganancias', 'Otros', '', None, np.nan]
+
+# Diferencias entre el total y la suma de componentes alrededor de las tolerancias de 0.05 y 0.1
+DIFERENCIAS_BORDE = [0.0, 0.01, 0.049, 0.05, 0.0500001, 0.051, 0.09, 0.0999999, 0.1, 0.1000001, 0.11, -0.05, -0.1, -0.11, 0.1 + 0.2 - 0.3, 1e-9, -1e-9]
+
+
+def _cuit(rng):
+    """CUIT con formatos variados (guiones, numérico, float) o faltante."""
+    base = f"{rng.choice(['20', '23', '27', '30', '33'])}{rng.randint(10000000, 99999999)}{rng.randint(0, 9)}"
+    formato = rng.random()
+    if formato < 0.45:
+        return base
+    if formato < 0.6:
+        return f"{base[:2]}-{base[2:10]}-{base[10:]}"
+    if formato < 0.7:
+        return int(base)
+    if formato < 0.75:
+        return float(base)
+    if formato < 0.8:
+        return f" {base} "
+    return rng.choice([None, np.nan, '', 'S/CUIT', '0'])
+
+
+def _numero(rng, punto_venta, numero):
+    """Número de comprobante con o sin punto de venta, ceros a la izquierda, numérico o faltante."""
+    formato = rng.random()
+    if formato < 0.4:
+        return f"{numero:08d}"
+    if formato < 0.55:
+        return f"{punto_venta:05d}-{numero:08d}"
+    if formato < 0.7:
+        return numero
+    if formato < 0.78:
+        return float(numero)
+    if formato < 0.85:
+        return str(numero)
+    if formato < 0.9:
+        return f"A-{punto_venta:04d}-{numero}"
+    return rng.choice([None, np.nan, ''])
+
+
+def _importe(rng):
+    """Importe con centavos, ceros, negativos, textos y faltantes."""
+    valor = rng.random()
+    if valor < 0.75:
+        return round(rng.uniform(0, 500000), rng.choice([0, 1, 2, 2, 2, 3]))
+    if valor < 0.82:
+        return 0
+    if valor < 0.87:
+        return -round(rng.uniform(0, 10000), 2)
+    if valor < 0.92:
+        return rng.choice(['1234.56', 'N/A', '', '12,50'])
+    return rng.choice([None, np.nan])
+
+
+def _variante(rng, valor, opciones):
+    """Devuelve el mismo valor que la contraparte, o uno de formato distinto pero equivalente."""
+    return valor if rng.random() < 0.7 else rng.choice(opciones)
+
+
+def _variar_mapeo(rng, column_map, campo_cai=None):
+    """
+    En algunos casos altera el mapeo como puede quedar en la interfaz: campos sin columna elegida y dos campos
+    apuntando a la misma columna (p. ej. el CAI inferido sobre la columna del número).
+    """
+    column_map = dict(column_map)
+    if rng.random() < 0.3:
+        for campo in list(column_map):
+            if rng.random() < 0.1:
+                del column_map[campo]
+    if rng.random() < 0.2 and len(column_map) >= 2:
+        campo, otro = rng.sample(sorted(column_map), 2)
+        column_map[campo] = column_map[otro]
+    if campo_cai and rng.random() < 0.1:
+        column_map[campo_cai] = column_map.get('numero_comprobante')
+    return column_map
+
+
+def generar_caso(rng, filas=20):
+    """
+    Genera un caso aleatorio: (comprobantes_df, percepciones_df, template_df, column_map_comp, column_map_perc, column_map_template).
+    Incluye comprobantes sin percepciones, percepciones sin comprobante, varios regímenes por comprobante,
+    CUITs faltantes y diferencias en el borde de las tolerancias de redondeo.
+    """
+    comprobantes = []
+    percepciones = []
+    for _ in range(filas):
+        punto_venta = rng.randint(1, 99999)
+        numero = rng.randint(1, 99999999)
+        cuit = _cuit(rng)
+        neto = _importe(rng)
+        iva = round(pd.to_numeric(neto, errors='coerce') * rng.choice([0.21, 0.105, 0.27, 0]), 2) if rng.random() < 0.9 else _importe(rng)
+        exento = _importe(rng) if rng.random() < 0.2 else 0
+        no_gravado = _importe(rng) if rng.random() < 0.2 else 0
+
+        # Percepciones del comprobante: ninguna, una o varias (multi-régimen)
+        cantidad_perc = rng.choice([0, 0, 1, 1, 1, 2, 3])
+        importes_perc = []
+        for _ in range(cantidad_perc):
+            importe_perc = round(rng.uniform(0, 5000), 2) if rng.random() < 0.9 else _importe(rng)
+            importes_perc.append(importe_perc)
+            percepciones.append({
+                'CUIT Agente Ret./Perc.': _variante(rng, cuit, [_cuit(rng), str(cuit), None]),
+                'Número Comprobante': _variante(rng, _numero(rng, punto_venta, numero), [numero, f"{numero:08d}", f"{punto_venta:05d}-{numero:08d}"]),
+                'Impuesto': rng.choice(IMPUESTOS),
+                'Descripción Impuesto': rng.choice(DESC_IMPUESTOS),
+                'Régimen': rng.choice(REGIMENES_CONOCIDOS + REGIMENES_RAROS),
+                'Descripción Régimen': rng.choice(REGIMENES_CONOCIDOS + REGIMENES_RAROS),
+                'Importe Ret./Perc.': importe_perc,
+            })
+
+        # Total: base + percepciones informadas (o no) + diferencia en el borde de la tolerancia
+        base = sum(pd.to_numeric(v, errors='coerce') if pd.notna(pd.to_numeric(v, errors='coerce')) else 0 for v in [neto, iva, exento, no_gravado])
+        suma_perc = sum(v for v in importes_perc if isinstance(v, (int, float)) and not math.isnan(v))
+        if rng.random() < 0.15:
+            total = _importe(rng)
+        else:
+            total = base + rng.choice([suma_perc, 0, suma_perc]) + rng.choice(DIFERENCIAS_BORDE)
+
+        comprobantes.append({
+            'Fecha': pd.Timestamp('2024-01-01') + pd.Timedelta(days=rng.randint(0, 365)) if rng.random() < 0.95 else None,
+            'Tipo': rng.choice(TIPOS_COMPROBANTE),
+            'Punto de Venta': punto_venta if rng.random() < 0.9 else None,
+            'Número Desde': _numero(rng, punto_venta, numero),
+            'Nro. Doc. Emisor': cuit,
+            'Denominación Emisor': rng.choice(['PROVEEDOR SA', 'Juan Pérez', 'ACME S.R.L.', '', None]),
+            'Imp. Neto Gravado': neto,
+            'IVA': iva,
+            'Imp. Op. Exentas': exento,
+            'Imp. Neto No Gravado': no_gravado,
+            'Imp. Total': total,
+            'Moneda': rng.choice(['$', 'USD', None]),
+            'Tipo Cambio': rng.choice([1, 1.0, 850.5, None]),
+        })
+
+    # Percepciones huérfanas (sin comprobante que las acompañe)
+    for _ in range(rng.randint(0, max(1, filas // 5))):
+        percepciones.append({
+            'CUIT Agente Ret./Perc.': _cuit(rng),
+            'Número Comprobante': _numero(rng, rng.randint(1, 9999), rng.randint(1, 99999999)),
+            'Impuesto': rng.choice(IMPUESTOS),
+            'Descripción Impuesto': rng.choice(DESC_IMPUESTOS),
+            'Régimen': rng.choice(REGIMENES_CONOCIDOS + REGIMENES_RAROS),
+            'Descripción Régimen': rng.choice(REGIMENES_CONOCIDOS + REGIMENES_RAROS),
+            'Importe Ret./Perc.': _importe(rng),
+        })
+
+    comprobantes_df = pd.DataFrame(comprobantes)
+    percepciones_df = pd.DataFrame(percepciones, columns=['CUIT Agente Ret./Perc.', 'Número Comprobante', 'Impuesto', 'Descripción Impuesto', 'Régimen', 'Descripción Régimen', 'Importe Ret./Perc.'])
+
+    column_map_comp = {
+        'fecha_emision': 'Fecha',
+        'tipo_comprobante': 'Tipo',
+        'punto_venta': 'Punto de Venta',
+        'numero_comprobante': 'Número Desde',
+        'cuit_proveedor': 'Nro. Doc. Emisor',
+        'razon_social_proveedor': 'Denominación Emisor',
+        'importe_neto': 'Imp. Neto Gravado',
+        'iva_inscripto': 'IVA',
+        'importe_exento': 'Imp. Op. Exentas',
+        'impuestos_internos_no_gravado': 'Imp. Neto No Gravado',
+        'importe_total_comprobante': 'Imp. Total',
+        'moneda': 'Moneda',
+        'cotizacion': 'Tipo Cambio',
+    }
+    column_map_perc = {
+        'cuit_agente': 'CUIT Agente Ret./Perc.',
+        'numero_comprobante': 'Número Comprobante',
+        'impuesto': 'Impuesto',
+        'descripcion_impuesto': 'Descripción Impuesto',
+        'regimen': 'Régimen',
+        'descripcion_regimen': 'Descripción Régimen',
+        'importe_percepcion': 'Importe Ret./Perc.',
+    }
+
+    # Plantilla ONVIO: todas las columnas internas más una columna que queda sin mapear
+    column_map_template = {
+        'Fecha de Emisión': 'Fecha de Emisión',
+        'Tipo de Comprobante': 'TIPO_COMPROBANTE_ESTANDAR',
+        'Letra': 'LETRA_COMPROBANTE_ESTANDAR',
+        'Punto de Venta': 'Punto de Venta',
+        'Número': 'Número',
+        'Número de CAI': 'Número de CAI',
+        'Razón social del Provedor': 'Razón social del Provedor',
+        'CUIT': 'CUIT del Proveedor',
+        'Número de Documento del Cliente': 'CUIT del Proveedor',
+        'Situación de IVA del Proveedor': 'SITUACION_IVA_ESTANDAR',
+        'Cotización': 'Cotización',
+        'Moneda': 'Moneda',
+        'Importe Neto': 'Importe Neto',
+        'IVA Inscripto': 'IVA Inscripto',
+        'Importe Exento': 'Importe Exento',
+        'Impuestos Internos / No Gravado': 'Impuestos Internos / No Gravado',
+        'Importe Percepción': 'PERCEPCION_FINAL',
+        'Importe Total del Comprobante': 'Importe Total del Comprobante',
+        'Provincia IIBB': 'Provincia IIBB',
+        'Cód. Regimen Especial': 'COD_REGIMEN_ONVIO',
+        'Art. Regimen Especial': 'ART_REGIMEN_ONVIO',
+        'Desc. Regimen Especial': 'DESC_REGIMEN_ONVIO',
+        'Alerta / Observación': 'ALERTA_DIFERENCIA_FINAL',
+    }
+    template_df = pd.DataFrame(columns=list(column_map_template) + ['Columna Sin Mapear'])
+
+    column_map_comp = _variar_mapeo(rng, column_map_comp, campo_cai='numero_cai')
+    column_map_perc = _variar_mapeo(rng, column_map_perc)
+    return comprobantes_df, percepciones_df, template_df, column_map_comp, column_map_perc, column_map_template
+
+
+# Casos fijos del cruce alternativo: (descripción, comprobantes, percepciones, métodos esperados por comprobante).
+# Comprobantes: (CUIT, punto de venta, número, total) con neto 100 e IVA 21; percepciones: (CUIT, número, importe,
+# impuesto, régimen). Un método vacío significa que el comprobante no se asocia.
+CASOS_CRUCE_ALTERNATIVO = [
+    ("Clave exacta", [('20111111112', 1, '123', 131)], [('20111111112', '123', 10, 'IVA', '493')], ['EXACTO']),
+    ("Número float vs. ceros a la izquierda", [('20111111112', 1, 12.0, 131)], [('20111111112', '00000012', 10, 'IVA', '493')], ['NUMERO_SIN_CEROS']),
+    ("Punto de venta solo en percepciones", [('20111111112', 3, 78, 131)], [('20111111112', '0003-00000078', 10, 'IVA', '493')], ['PUNTO_VENTA_NUMERO']),
+    ("Mismos últimos 8 dígitos", [('20111111112', 7, '0004-00000099', 131)], [('20111111112', '0005-00000099', 10, 'IVA', '493')], ['NUMERO_SIN_PUNTO_VENTA']),
+    ("Mismo CUIT e importe", [('20111111112', 1, '100', 131)], [('20111111112', '555', 10, 'IVA', '493')], ['IMPORTE']),
+    (
+        "Importe ambiguo: dos claves explican la diferencia",
+        [('20111111112', 1, '200', 131)],
+        [('20111111112', '900', 10, 'IVA', '493'), ('20111111112', '901', 10, 'IIBB', 'IBCF')],
+        [''],
+    ),
+    (
+        "Importe ambiguo: una clave explica dos comprobantes",
+        [('20111111112', 1, '300', 131), ('20111111112', 1, '301', 131.05)],
+        [('20111111112', '999', 10, 'IVA', '493')],
+        ['', ''],
+    ),
+    (
+        "Número ambiguo: los mismos últimos 8 dígitos en dos claves",
+        [('20111111112', None, '50', 131)],
+        [('20111111112', '0001-00000050', 10, 'IVA', '493'), ('20111111112', '0002-00000050', 10, 'IVA', '493')],
+        [''],
+    ),
+    ("Otro CUIT no se asocia", [('20111111112', 1, '100', 131)], [('30222222223', '100', 10, 'IVA', '493')], ['']),
+]
+
+
+def verificar_cruce_alternativo(casos=None):
+    """
+    Procesa los casos fijos del cruce alternativo con el motor vectorizado, con y sin la pasada por importe (sin ella,
+    los comprobantes que se esperan por IMPORTE no se asocian). El método se toma del detalle de cruce, no de la plantilla.
+    Retorna una lista de textos con las diferencias entre el método obtenido y el esperado (vacía si todo coincide).
+    """
+    column_map_comp = {
+        'punto_venta': 'PV', 'numero_comprobante': 'Número', 'cuit_proveedor': 'CUIT', 'importe_neto': 'Neto',
+        'iva_inscripto': 'IVA', 'importe_total_comprobante': 'Total', 'tipo_comprobante': 'Tipo',
+    }
+    column_map_perc = {
+        'cuit_agente': 'CUIT', 'numero_comprobante': 'Número', 'importe_percepcion': 'Importe', 'impuesto': 'Impuesto',
+        'descripcion_impuesto': 'Descripción Impuesto', 'regimen': 'Régimen', 'descripcion_regimen': 'Descripción Régimen',
+    }
+    column_map_template = {'Número': 'Número'}
+    template_df = pd.DataFrame(columns=list(column_map_template))
+
+    diferencias = []
+    for descripcion, comprobantes, percepciones, esperados in casos or CASOS_CRUCE_ALTERNATIVO:
+        comprobantes_df = pd.DataFrame(
+            [{'CUIT': cuit, 'PV': punto_venta, 'Número': numero, 'Neto': 100, 'IVA': 21, 'Total': total, 'Tipo': '1 - Factura A'}
+             for cuit, punto_venta, numero, total in comprobantes]
+        )
+        percepciones_df = pd.DataFrame(
+            [{'CUIT': cuit, 'Número': numero, 'Importe': importe, 'Impuesto': impuesto, 'Descripción Impuesto': impuesto,
+              'Régimen': regimen, 'Descripción Régimen': regimen} for cuit, numero, importe, impuesto, regimen in percepciones]
+        )
+        for por_importe in [True, False]:
+            esperados_pasada = esperados if por_importe else ['' if metodo == 'IMPORTE' else metodo for metodo in esperados]
+            detalle_cruce = {}
+            resultado, mensaje = process_and_fill_template_vectorizado(
+                comprobantes_df, percepciones_df, template_df, column_map_comp, column_map_perc, column_map_template,
+                cruce_alternativo=True, cruce_por_importe=por_importe, detalle_cruce=detalle_cruce
+            )
+            if resultado is None:
+                diferencias.append(f"{descripcion}: {mensaje}")
+                continue
+            obtenidos = list(detalle_cruce['cruce']['Método de Cruce'])
+            if obtenidos != esperados_pasada:
+                diferencias.append(f"{descripcion} (por importe: {'sí' if por_importe else 'no'}): esperado {esperados_pasada}, obtenido {obtenidos}")
+    return diferencias
+
+
+# Casos fijos de duplicados en comprobantes: (descripción, filas de cada período, esperado en el último período).
+# Filas: (CUIT, punto de venta, número, tipo, total). Esperado: (exactos, repetidos por clave, claves incompletas,
+# repetidos exactos de períodos anteriores, repetidos por clave de períodos anteriores, filas que conserva el
+# nivel 'exactos', filas que conserva el nivel 'clave').
+CASOS_DUPLICADOS = [
+    ("Copia exacta", [[('20111111112', 1, 10, 'FA', 100), ('20111111112', 1, 10, 'FA', 100)]], (1, 0, 0, 0, 0, 1, 1)),
+    ("Misma clave con otro importe", [[('20111111112', 1, 10, 'FA', 100), ('20111111112', 1, 10, 'FA', 250)]], (0, 1, 0, 0, 0, 2, 1)),
+    ("Número con ceros a la izquierda", [[('20111111112', '0001', '00000010', 'FA', 100), ('20111111112', 1, 10.0, 'FA', 250)]], (0, 1, 0, 0, 0, 2, 1)),
+    ("Otro punto de venta no es duplicado", [[('20111111112', 1, 10, 'FA', 100), ('20111111112', 2, 10, 'FA', 100)]], (0, 0, 0, 0, 0, 2, 2)),
+    ("Otro tipo de comprobante no es duplicado", [[('20111111112', 1, 10, 'FA', 100), ('20111111112', 1, 10, 'NCA', 100)]], (0, 0, 0, 0, 0, 2, 2)),
+    ("Clave incompleta no se agrupa", [[('20111111112', 1, None, 'FA', 100), ('20111111112', 1, '', 'FA', 250)]], (0, 0, 2, 0, 0, 2, 2)),
+    (
+        "Copia exacta y misma clave en el mismo grupo",
+        [[('20111111112', 1, 10, 'FA', 100), ('20111111112', 1, 10, 'FA', 100), ('20111111112', 1, 10, 'FA', 250)]],
+        (1, 1, 0, 0, 0, 2, 1),
+    ),
+    (
+        "Fila repetida de un período anterior",
+        [[('20111111112', 1, 10, 'FA', 100)], [('20111111112', 1, 10, 'FA', 100), ('20111111112', 1, 11, 'FA', 100)]],
+        (0, 0, 0, 1, 0, 1, 1),
+    ),
+    (
+        "Clave repetida de un período anterior",
+        [[('20111111112', 1, 10, 'FA', 100)], [('20111111112', '0001', '10', 'FA', 250)]],
+        (0, 0, 0, 0, 1, 1, 0),
+    ),
+]
+
+
+def verificar_duplicados(casos=None):
+    """
+    Procesa los casos fijos de duplicados período por período, arrastrando los hashes de los anteriores.
+    Retorna una lista de textos con las diferencias en el último período (vacía si todo coincide).
+    """
+    diferencias = []
+    for descripcion, periodos, esperado in casos or CASOS_DUPLICADOS:
+        hashes_previos = nuevos_hashes_previos()
+        for filas in periodos:
+            df = pd.DataFrame(filas, columns=['CUIT', 'PV', 'Número', 'Tipo', 'Total'])
+            deteccion = detectar_repetidos_previos(detectar_duplicados(df, ['CUIT', 'PV', 'Número'], ['Tipo']), hashes_previos)
+        resumen = resumen_duplicados(deteccion)
+        obtenido = (
+            resumen['exactos'], resumen['clave'], resumen['clave_incompleta'], resumen['previos_exactos'], resumen['previos_clave'],
+            len(eliminar_duplicados(df, deteccion, 'exactos')), len(eliminar_duplicados(df, deteccion, 'clave')),
+        )
+        if obtenido != esperado:
+            diferencias.append(f"{descripcion}: esperado {esperado}, obtenido {obtenido}")
+    return diferencias
+
+
+def generar_casos(cantidad, filas=20, semilla=0):
+    """Genera `cantidad` casos reproducibles. El tamaño de cada caso varía entre 0 y `filas` comprobantes."""
+    rng = random.Random(semilla)
+    return [generar_caso(rng, filas=rng.randint(0, filas)) for _ in range(cantidad)]
+
+
+def _celdas_iguales(esperado, obtenido):
+    """Compara dos celdas: nulos equivalentes entre sí, números por valor exacto, el resto por igualdad estricta de tipo y valor."""
+    esperado_nulo = esperado is None or (not isinstance(esperado, str) and pd.isna(esperado))
+    obtenido_nulo = obtenido is None or (not isinstance(obtenido, str) and pd.isna(obtenido))
+    if esperado_nulo or obtenido_nulo:
+        return esperado_nulo and obtenido_nulo
+    numericos = (int, float, np.integer, np.floating)
+    if isinstance(esperado, numericos) and isinstance(obtenido, numericos):
+        return float(esperado) == float(obtenido) and isinstance(esperado, (bool, np.bool_)) == isinstance(obtenido, (bool, np.bool_))
+    if isinstance(esperado, str) != isinstance(obtenido, str):
+        return False
+    return esperado == obtenido
+
+
+def comparar_plantillas(esperado, obtenido, max_diferencias=20):
+    """Retorna una lista de diferencias (descripciones legibles) entre dos plantillas completadas."""
+    if esperado is None or obtenido is None:
+        if esperado is None and obtenido is None:
+            return []
+        return [f"Un motor falló y el otro no (referencia {'falló' if esperado is None else 'ok'}, optimizado {'falló' if obtenido is None else 'ok'})"]
+
+    diferencias = []
+    if list(esperado.columns) != list(obtenido.columns):
+        diferencias.append(f"Columnas distintas: {list(esperado.columns)} != {list(obtenido.columns)}")
+    if len(esperado) != len(obtenido):
+        diferencias.append(f"Cantidad de filas distinta: {len(esperado)} != {len(obtenido)}")
+    if diferencias:
+        return diferencias
+
+    for col in esperado.columns:
+        valores_esperados = esperado[col].astype(object).to_numpy()
+        valores_obtenidos = obtenido[col].astype(object).to_numpy()
+        for fila, (a, b) in enumerate(zip(valores_esperados, valores_obtenidos)):
+            if not _celdas_iguales(a, b):
+                diferencias.append(f"Fila {fila}, columna '{col}': {a!r} != {b!r}")
+                if len(diferencias) >= max_diferencias:
+                    return diferencias
+    return diferencias
+
+
+def mapeo_rechazado(caso):
+    """Indica si el mapeo del caso no tiene número o CUIT del proveedor utilizables, o deja columnas repetidas."""
+    comprobantes_df, percepciones_df, _, column_map_comp, column_map_perc, _ = caso
+    return bool(
+        campos_clave_faltantes(column_map_comp, comprobantes_df.columns)
+        or columnas_repetidas(comprobantes_df.columns, column_map_comp, COLUMNAS_ESTANDAR_COMP)
+        or columnas_repetidas(percepciones_df.columns, column_map_perc, COLUMNAS_ESTANDAR_PERC)
+    )
+
+
+def verificar_equivalencia(casos, motores=None):
+    """
+    Procesa cada caso con el motor de referencia y con cada motor optimizado.
+    Los casos con mapeos que los motores optimizados rechazan (ver `mapeo_rechazado`) solo se verifican por el
+    rechazo: el motor de referencia falla o no según los datos.
+    Retorna un dict {nombre_motor: [(indice_caso, diferencias), ...]} con los casos que no coinciden.
+    """
+    motores = motores or MOTORES
+    fallas = {nombre: [] for nombre in motores if nombre != MOTOR_REFERENCIA}
+    for indice, caso in enumerate(casos):
+        esperado, _ = motores[MOTOR_REFERENCIA](*caso)
+        for nombre, motor in motores.items():
+            if nombre == MOTOR_REFERENCIA:
+                continue
+            obtenido, _ = motor(*caso)
+            if mapeo_rechazado(caso):
+                diferencias = [] if obtenido is None else ["Mapeo inválido aceptado (sin número o CUIT del proveedor, o con columnas repetidas)"]
+            else:
+                diferencias = comparar_plantillas(esperado, obtenido)
+            if diferencias:
+                fallas[nombre].append((indice, diferencias))
+    return fallas
+
+
+def comparar_rendimiento(casos, motores=None, repeticiones=1):
+    """Retorna {nombre_motor: segundos} con el mejor tiempo total de procesar todos los casos."""
+    motores = motores or MOTORES
+    tiempos = {}
+    for nombre, motor in motores.items():
+        mejor = None
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            for caso in casos:
+                motor(*caso)
+            duracion = time.perf_counter() - inicio
+            mejor = duracion if mejor is None else min(mejor, duracion)
+        tiempos[nombre] = mejor
+    return tiempos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pruebas diferenciales y comparación de rendimiento entre motores de procesamiento.")
+    parser.add_argument('--casos', type=int, default=200, help="Cantidad de casos aleatorios a generar")
+    parser.add_argument('--filas', type=int, default=30, help="Máximo de comprobantes por caso")
+    parser.add_argument('--semilla', type=int, default=0, help="Semilla para reproducir los casos")
+    parser.add_argument('--rendimiento', action='store_true', help="Además de verificar, comparar tiempos de cada motor")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Repeticiones para la comparación de rendimiento")
+    args = parser.parse_args(argv)
+
+    # Los motores registran cada fila procesada; silenciar para que se vea el reporte
+    logging.disable(logging.CRITICAL)
+
+    casos = generar_casos(args.casos, filas=args.filas, semilla=args.semilla)
+    fallas = verificar_equivalencia(casos)
+
+    hubo_fallas = False
+    for nombre, casos_fallidos in fallas.items():
+        if casos_fallidos:
+            hubo_fallas = True
+            print(f"❌ {nombre}: {len(casos_fallidos)} de {len(casos)} casos difieren de la referencia (semilla {args.semilla})")
+            for indice, diferencias in casos_fallidos[:5]:
+                print(f"  Caso {indice}:")
+                for diferencia in diferencias:
+                    print(f"    {diferencia}")
+        else:
+            print(f"✅ {nombre}: {len(casos)} casos idénticos a la referencia")
+
+    diferencias_cruce = verificar_cruce_alternativo()
+    if diferencias_cruce:
+        hubo_fallas = True
+        print(f"❌ cruce alternativo: {len(diferencias_cruce)} de {len(CASOS_CRUCE_ALTERNATIVO)} casos fijos con otro método")
+        for diferencia in diferencias_cruce:
+            print(f"    {diferencia}")
+    else:
+        print(f"✅ cruce alternativo: {len(CASOS_CRUCE_ALTERNATIVO)} casos fijos con el método esperado")
+
+    diferencias_duplicados = verificar_duplicados()
+    if diferencias_duplicados:
+        hubo_fallas = True
+        print(f"❌ duplicados: {len(diferencias_duplicados)} de {len(CASOS_DUPLICADOS)} casos fijos con otras cantidades")
+        for diferencia in diferencias_duplicados:
+            print(f"    {diferencia}")
+    else:
+        print(f"✅ duplicados: {len(CASOS_DUPLICADOS)} casos fijos con las cantidades esperadas")
+
+    if args.rendimiento:
+        tiempos = comparar_rendimiento(casos, repeticiones=args.repeticiones)
+        filas_totales = sum(len(caso[0]) for caso in casos)
+        print(f"\nRendimiento ({len(casos)} casos, {filas_totales} comprobantes, mejor de {args.repeticiones}):")
+        for nombre, segundos in tiempos.items():
+            print(f"  {nombre:<12} {segundos:8.3f} s  (x{tiempos[MOTOR_REFERENCIA] / segundos:.1f})")
+
+    return 1 if hubo_fallas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())